@@ -7,6 +7,7 @@ from .routes import auth, posts, chats, image, profile, friend, comments, like,
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .db import engine, Base
+from .services.dispatcher import dispatcher
 import asyncio
 
 app = FastAPI(title="FastAPI Session")
@@ -46,11 +47,21 @@ app.include_router(gallery.router)
 
 @app.on_event("startup")
 async def on_startup():
+    # per-process caches would serve stale chat membership and miss other workers' WebSocket events
+    if settings.web_concurrency > 1 and "memory" in (settings.cache_backend, settings.broadcast_backend):
+        raise RuntimeError("cache_backend and broadcast_backend must be 'redis' when running more than one worker")
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
     except Exception:
         pass
+    await websocket.manager.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await dispatcher.stop()
+    await websocket.manager.stop()
 
 # ALTER TABLE users
 # ADD COLUMN IF NOT EXISTS avatar_url VARCHAR(255),
@@ -59,6 +70,19 @@ async def on_startup():
 # ALTER TABLE chat
 # ADD COLUMN IF NOT EXISTS avatar_url VARCHAR(255),
 
+# ALTER TABLE posts
+# ADD COLUMN IF NOT EXISTS like_count INTEGER NOT NULL DEFAULT 0,
+# ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0;
+# then: python -m app.cli reconcile-counters
+
+# ALTER TABLE users
+# ADD COLUMN IF NOT EXISTS is_celebrity BOOLEAN NOT NULL DEFAULT false;
+# timeline_entries is created by create_all; then: python -m app.cli backfill-timelines
+
+# Schema changes from here on ship as Alembic migrations (migrations/versions):
+#   alembic upgrade head
+#   python -m app.cli explain-queries   # check hot queries use their indexes
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
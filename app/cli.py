@@ -0,0 +1,79 @@
+import asyncio
+
+import typer
+
+from .db import AsyncSessionLocal
+from .services.benchmarks import bench_inbox
+from .services.counters import reconcile_post_counters
+from .services.query_plans import explain_hot_queries
+from .services.timeline import backfill_timelines
+
+cli = typer.Typer()
+
+
+@cli.callback()
+def main():
+    """Maintenance commands, run as `python -m app.cli <command>`."""
+
+
+@cli.command("reconcile-counters")
+def reconcile_counters():
+    """Recompute post like/comment counters from the source tables."""
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await reconcile_post_counters(db)
+
+    fixed = asyncio.run(run())
+    typer.echo(f"Reconciled counters on {fixed} post(s)")
+
+
+@cli.command("backfill-timelines")
+def backfill_timelines_command():
+    """Materialize home timelines for posts created before fan-out on write."""
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await backfill_timelines(db)
+
+    inserted = asyncio.run(run())
+    typer.echo(f"Inserted {inserted} timeline entries")
+
+
+@cli.command("explain-queries")
+def explain_queries(
+    force_index: bool = typer.Option(False, help="Disable sequential scans (use on small development tables)."),
+    verbose: bool = typer.Option(False, help="Print every plan, not only the failing ones."),
+):
+    """EXPLAIN each route's hot query and check that it uses its index."""
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await explain_hot_queries(db, force_index=force_index)
+
+    missing = 0
+    for name, used, plan in asyncio.run(run()):
+        if used:
+            typer.echo(f"OK       {name}: {used}")
+        else:
+            missing += 1
+            typer.echo(f"NO INDEX {name}")
+        if verbose or not used:
+            typer.echo("    " + plan.replace("\n", "\n    "))
+    raise typer.Exit(code=1 if missing else 0)
+
+
+@cli.command("bench-inbox")
+def bench_inbox_command(sizes: list[int] = typer.Argument(None, help="Inbox sizes to measure (default: 1 10 100 300).")):
+    """Show that GET /chats/ issues a constant number of queries as the inbox grows.
+
+    Seed data is written inside a transaction that is rolled back afterwards.
+    """
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await bench_inbox(db, sizes or [1, 10, 100, 300])
+
+    typer.echo(f"{'chats':>6} {'queries':>8} {'ms':>8}")
+    for size, queries, elapsed in asyncio.run(run()):
+        typer.echo(f"{size:>6} {queries:>8} {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -6,6 +6,60 @@ class Settings(BaseSettings):
     session_expire_minutes: int = 60
     upload_dir: str = "uploads"
 
+    feed_page_size: int = 20
+    feed_max_page_size: int = 100
+    comment_preview_size: int = 3
+    timeline_fanout_limit: int = 1000
+    timeline_backfill_size: int = 50
+    message_page_size: int = 50
+    message_max_page_size: int = 200
+    search_page_size: int = 20
+    search_max_page_size: int = 50
+    # rows per COPY when importing message history
+    message_import_batch_size: int = 10000
+    # operator credential for message imports (X-Import-Token header); imports are disabled when unset
+    message_import_token: str | None = None
+    # rows fetched per round trip when streaming an export
+    message_export_batch_size: int = 1000
+
+    # worker processes serving the app (WEB_CONCURRENCY, which uvicorn and gunicorn also read);
+    # with more than one, the memory cache and broadcast backends are refused at startup
+    web_concurrency: int = 1
+    # "memory" (per process) or "redis"
+    cache_backend: str = "memory"
+    # "memory" (single worker) or "redis" pub/sub, so WebSocket events reach every worker
+    broadcast_backend: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    post_cache_size: int = 10000
+    post_cache_ttl: int = 3600
+    membership_cache_size: int = 100000
+    membership_cache_ttl: int = 3600
+    profile_cache_size: int = 100000
+    profile_cache_ttl: int = 3600
+
+    # jobs queued for the background dispatcher (WebSocket fan-out) before new ones are dropped
+    dispatcher_max_pending: int = 10000
+    # frames queued per WebSocket connection; a full queue evicts the connection
+    ws_send_queue_size: int = 256
+    # a connection whose backlog stays at or above the threshold for the grace period is evicted
+    ws_slow_queue_threshold: int = 64
+    ws_slow_consumer_grace: float = 10.0
+    ws_send_timeout: float = 5.0
+    ws_max_concurrent_sends: int = 1000
+    # the server pings connections that have sent a client frame this often; one silent for
+    # ws_idle_timeout is closed. Other clients rely on uvicorn's --ws-ping-interval/--ws-ping-timeout
+    ws_heartbeat_interval: float = 25.0
+    ws_idle_timeout: float = 60.0
+    ws_max_connections_per_user: int = 5
+    # recent events kept per user for resume; older gaps fall back to the database. The
+    # in-process log holds at most buffer_size * log_users frames (a few hundred bytes each,
+    # so ~200 MB with these defaults) and drops users without events for ws_event_log_ttl
+    ws_event_buffer_size: int = 64
+    ws_event_log_users: int = 10000
+    ws_event_log_ttl: int = 3600
+    # most messages a resume may fetch from the database before asking the client to resync
+    ws_resume_max_messages: int = 500
+
     S3_ENDPOINT_URL: str = "https://storage.yandexcloud.net"
     S3_REGION: str = "ru-central1"
     S3_BUCKET_NAME: str = "dangeon-bucket-image"
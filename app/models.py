@@ -1,10 +1,15 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 
 from .db import Base
 
+# text search configuration of Message.search_vector; "simple" does no stemming, so it
+# treats Russian and English content alike
+MESSAGE_SEARCH_CONFIG = "simple"
+
 
 class User(Base):
     __tablename__ = "users"
@@ -13,6 +18,8 @@ class User(Base):
     password_hash = Column(String)
     avatar_url = Column(String(255))
     fon_url = Column(String(255))
+    # too many friends to fan posts out on write; their posts are merged into timelines on read
+    is_celebrity = Column(Boolean, nullable=False, default=False, server_default="false")
 
     messages_sent = relationship("Message", back_populates="sender")
     chats = relationship("ChatMember", back_populates="user")
@@ -42,10 +49,21 @@ class Chat(Base):
     name = Column(String(255))
     is_group = Column(Boolean, default=False)
     avatar_url = Column(String(255))
+    # summary of the newest message, maintained by send_message
+    last_message_id = Column(Integer)
+    last_message_at = Column(DateTime)
+    last_message_preview = Column(String(255))
+    # private chats only: the two members as (smaller id, larger id), unique per pair
+    dm_user_low = Column(Integer, ForeignKey('users.id'))
+    dm_user_high = Column(Integer, ForeignKey('users.id'))
 
     members = relationship("ChatMember", back_populates="chat", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        UniqueConstraint("dm_user_low", "dm_user_high", name="uq_chats_dm_pair"),
+    )
+
 
 class ChatMember(Base):
     __tablename__ = 'chat_members'
@@ -53,10 +71,23 @@ class ChatMember(Base):
     chat_id = Column(Integer, ForeignKey('chats.id'), primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     joined_at = Column(DateTime, default=datetime.utcnow)
+    last_read_message_id = Column(Integer)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # inbox sort key: time of the chat's newest message, or of joining before any message
+    last_activity_at = Column(DateTime, default=datetime.utcnow)
 
     chat = relationship("Chat", back_populates="members")
     user = relationship("User", back_populates="chats")
 
+    __table_args__ = (
+        Index(
+            "ix_chat_members_user_id_last_activity_at",
+            user_id,
+            last_activity_at.desc().nulls_last(),
+            chat_id.desc(),
+        ),
+    )
+
 
 class Message(Base):
     __tablename__ = 'messages'
@@ -68,10 +99,20 @@ class Message(Base):
     attachment_url = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
     is_read = Column(Boolean, default=False)
+    # full-text search document, kept up to date by Postgres
+    search_vector = Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{MESSAGE_SEARCH_CONFIG}', coalesce(content, ''))", persisted=True),
+    )
 
     chat = relationship("Chat", back_populates="messages")
     sender = relationship("User", back_populates="messages_sent")
 
+    __table_args__ = (
+        Index("ix_messages_chat_id_id", "chat_id", "id"),
+        Index("ix_messages_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
 
 class Post(Base):
     __tablename__ = 'posts'
@@ -82,13 +123,35 @@ class Post(Base):
     content = Column(Text, nullable=False)
     image_url = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
+    # bumped by every change to the rendered post (edits, counters, author avatars); feeds the ETags
     updated_at = Column(DateTime, onupdate=datetime.utcnow)
     is_published = Column(Boolean, default=True)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     author = relationship("User", back_populates="posts", lazy="selectin")
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
     likes = relationship("Like", back_populates="post", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_author_id_created_at_id", "author_id", "created_at", "id"),
+    )
+
+
+class TimelineEntry(Base):
+    """Materialized home timeline: one row per (reader, post) written when the post is created."""
+    __tablename__ = "timeline_entries"
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    post_id = Column(Integer, ForeignKey('posts.id', ondelete="CASCADE"), primary_key=True)
+    author_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_timeline_entries_user_created", "user_id", "created_at", "post_id"),
+    )
+
 
 class Comment(Base):
     __tablename__ = 'comments'
@@ -102,6 +165,10 @@ class Comment(Base):
     post = relationship("Post", back_populates="comments")
     author = relationship("User")
 
+    __table_args__ = (
+        Index("ix_comments_post_id_created_at_id", "post_id", "created_at", "id"),
+    )
+
 
 class Image(Base):
     __tablename__ = "images"
@@ -123,6 +190,10 @@ class Like(Base):
     post = relationship("Post", back_populates="likes")
     author = relationship("User")
 
+    __table_args__ = (
+        UniqueConstraint("post_id", "author_id", name="uq_likes_post_id_author_id"),
+    )
+
 
 class Friend(Base):
     __tablename__ = "friends"
@@ -145,6 +216,12 @@ class Friend(Base):
         back_populates="friend_of"
     )
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "friend_id", name="uq_friends_user_id_friend_id"),
+        Index("ix_friends_user_id_friend_id_status", "user_id", "friend_id", "status"),
+        Index("ix_friends_friend_id_status", "friend_id", "status"),
+    )
+
 
 class Settings(Base):
     __tablename__ = "settings"
@@ -166,4 +243,8 @@ class ImageUser(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
 
     image = relationship("Image")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_image_users_user_id_private", "user_id", "private"),
+    )
@@ -1,25 +1,45 @@
 import datetime
+import secrets
+from functools import partial
 from typing import List
 
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from ..schemas import ChatCreate, MessageRead, MessageCreate, ChatSend, MessageSend, ChatMemberAdd, ChatMemberSend, \
-    ChatMemberAdd2
+from ..config import settings
+from ..schemas import ChatCreate, MessageRead, MessageCreate, ChatSend, ChatMemberAdd, \
+    ChatMemberAdd2, MessagePage, MessageSearchPage
 from ..models import Chat, Message, ChatMember, User
 from ..db import get_db
+from ..services.chat_membership import chat_member_ids, invalidate_chat_members
+from ..services.chat_summary import mark_read, record_message
+from ..services.dispatcher import dispatcher
+from ..services.inbox import load_chats
+from ..services.message_export import export_messages
+from ..services.message_history import message_page
+from ..services.message_import import import_messages, parse_message_array, parse_ndjson_messages
+from ..services.message_search import search_messages
+from ..services.private_chats import get_or_create_private_chat
 from ..services.session_manager import get_current_user
+from ..services.user_profiles import user_profiles
 from sqlalchemy.future import select
-from sqlalchemy import func
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
 async def is_chat_member(db, user_id, chat_id):
-    result = await db.execute(select(ChatMember).where(ChatMember.chat_id == chat_id).where(ChatMember.user_id == user_id))
-    if result.scalars().all():
-        return True
-    return False
+    return user_id in await chat_member_ids(db, chat_id)
+
+
+async def require_chat_member(db, user_id, chat_id):
+    """404 for an unknown chat, 403 for a non-member; members pass on a cache hit alone."""
+    if await is_chat_member(db, user_id, chat_id):
+        return
+    result = await db.execute(select(Chat.id).where(Chat.id == chat_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    raise HTTPException(status_code=403, detail="Forbidden")
 
 
 @router.post("/", response_model=ChatSend)
@@ -50,6 +70,7 @@ async def create_chat(chat: ChatCreate, request: Request, db: AsyncSession = Dep
 
     db.add_all(chat_members)
     await db.commit()
+    await invalidate_chat_members([chat_obj.id])
 
     return ChatSend(
         id=chat_obj.id,
@@ -76,86 +97,70 @@ async def create_private_chat(member: ChatMemberAdd2, request: Request, db: Asyn
     if not other_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    result = await db.execute(
-        select(Chat)
-        .join(ChatMember, Chat.id == ChatMember.chat_id)
-        .where(Chat.is_group == False)
-        .where(ChatMember.user_id.in_([current_user, member.userId]))
-        .group_by(Chat.id)
-        .having(func.count(ChatMember.user_id) == 2)
-    )
-    existing_chat = result.scalars().first()
-    if existing_chat:
+    chat_id, created = await get_or_create_private_chat(db, current_user, member.userId)
+    if not created:
         raise HTTPException(status_code=400, detail="Private chat already exists")
-
-    # Create the private chat
-    chat = Chat(name=None, is_group=False)
-    db.add(chat)
-    await db.commit()
-    await db.refresh(chat)
-
-    # Add chat members
-    chat_members = [
-        ChatMember(chat_id=chat.id, user_id=current_user),
-        ChatMember(chat_id=chat.id, user_id=member.userId),
-    ]
-    db.add_all(chat_members)
     await db.commit()
+    await invalidate_chat_members([chat_id])
 
     return ChatSend(
-        id=chat.id,
+        id=chat_id,
         name=str(member.userId),
         preview="...",
         chatTime=datetime.datetime.utcnow(),
     )
 
 
-@router.get("/{chat_id}", response_model=ChatSend)
-async def get_chat(chat_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+@router.put("/private/{user_id}", response_model=ChatSend)
+async def open_private_chat(user_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Get the private chat with another user, creating it on first use."""
+    current_user = get_current_user(request)
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    if current_user == user_id:
+        raise HTTPException(status_code=400, detail="Cannot create a private chat with yourself")
+
+    result = await db.execute(select(User.id).where(User.id == user_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    chat_id, created = await get_or_create_private_chat(db, current_user, user_id)
+    if created:
+        await db.commit()
+        await invalidate_chat_members([chat_id])
+
+    chats = await load_chats(db, current_user, chat_id)
+    return chats[0]
+
+
+@router.get("/search", response_model=MessageSearchPage)
+async def search_all_messages(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.search_page_size, ge=1, le=settings.search_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
+    """Search messages in every chat the current user is a member of."""
     user_id = get_current_user(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    if not await is_chat_member(db, user_id, chat_id):
-        raise HTTPException(status_code=404, detail="Not authenticated")
+    return await search_messages(db, user_id, q, None, offset, limit)
 
-    result = await db.execute(select(Chat).where(Chat.id == chat_id))
-    chat = result.scalars().first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
 
-    result = await db.execute(select(Message).where(Message.chat_id == chat_id).order_by(Message.created_at.desc()).limit(1))
-    message = result.scalars().first()
-
-    # Fetch chat members
-    result = await db.execute(select(ChatMember).where(ChatMember.chat_id == chat_id).options(selectinload(ChatMember.user)))
-    members = result.scalars().all()
-    member_names = [ChatMemberSend(
-        id = m.user.id,
-        username = m.user.username,
-        avatarUrl = m.user.avatar_url
-    ) for m in members]
-
-    mem = None
-    for m in members:
-        if m.user.id != user_id:
-            mem = m.user
-
-    if not chat.is_group and mem:
-        name = mem.username
-        chat_badge = mem.avatar_url
-    else:
-        name = chat.name
-        chat_badge = chat.avatar_url
+@router.get("/{chat_id}", response_model=ChatSend)
+async def get_chat(chat_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    user_id = get_current_user(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
 
-    return ChatSend(
-        id=chat.id,
-        name=name if name else "Undefined",
-        preview=message.content if message else "...",
-        chatBadge=chat_badge,
-        chatTime=message.created_at if message else datetime.datetime.utcnow(),
-        chatMembers=member_names,
-    )
+    # load_chats only returns chats the user is a member of
+    chats = await load_chats(db, user_id, chat_id)
+    if not chats:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chats[0]
 
 
 @router.get("/", response_model=List[ChatSend])
@@ -164,46 +169,7 @@ async def list_chats(request: Request, db: AsyncSession = Depends(get_db)):
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    result = await db.execute(select(Chat)
-                              .join(ChatMember, ChatMember.chat_id == Chat.id)
-                              .where(ChatMember.user_id == user_id))
-    chats = result.scalars().all()
-    res = []
-    for c in chats:
-        result = await db.execute(
-            select(Message).where(Message.chat_id == c.id).order_by(Message.created_at.desc()).limit(1))
-        message = result.scalars().first()
-
-        # Fetch chat members
-        result = await db.execute(select(ChatMember).where(ChatMember.chat_id == c.id).options(selectinload(ChatMember.user)))
-        members = result.scalars().all()
-        member_names = [ChatMemberSend(
-            id = m.user.id,
-            username = m.user.username,
-            avatarUrl = m.user.avatar_url
-        ) for m in members]
-
-        mem = None
-        for m in members:
-            if m.user.id != user_id:
-                mem = m.user
-
-        if not c.is_group and mem:
-            name = mem.username
-            chat_badge = mem.avatar_url
-        else:
-            name = c.name
-            chat_badge = c.avatar_url
-
-        res.append(ChatSend(
-            id=c.id,
-            name=name if name else "Undefined",
-            preview=message.content if message else "...",
-            chatBadge=chat_badge,
-            chatTime=message.created_at if message else datetime.datetime.utcnow(),
-            chatMembers=member_names,
-        ))
-    return res
+    return await load_chats(db, user_id)
 
 
 @router.post("/{chat_id}/messages", response_model=MessageRead)
@@ -212,70 +178,128 @@ async def send_message(chat_id: int, msg: MessageCreate, request: Request, db: A
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    result = await db.execute(select(Chat).where(Chat.id == chat_id))
-    chat = result.scalars().first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    await require_chat_member(db, user_id, chat_id)
+
+    # Lock the chat row before the INSERT (record_message would take it anyway): sends and
+    # imports into one chat then commit in id order, so ids follow createdAt
+    await db.execute(select(Chat.id).where(Chat.id == chat_id).with_for_update())
+    result = await db.execute(
+        insert(Message)
+        .values(chat_id=chat_id, sender_id=user_id, content=msg.content, attachment_url=msg.imageUrl)
+        .returning(
+            Message.id, Message.chat_id, Message.sender_id, Message.content, Message.attachment_url, Message.created_at
+        )
+    )
+    message = result.one()
+    await record_message(db, chat_id, user_id, message.id, message.created_at, message.content)
+    await db.commit()
+
+    # fan-out runs on the dispatcher, so the response does not wait on recipients' sockets
+    sender = (await user_profiles(db, [user_id]))[user_id]
+    recipients = await chat_member_ids(db, chat_id)
+    from .websocket import manager
+    dispatcher.submit(partial(manager.broadcast_chat_message, message, sender, recipients))
+
+    return MessageRead(
+        id=message.id,
+        chat_id=message.chat_id,
+        sender_id=message.sender_id,
+        content=message.content,
+        created_at=message.created_at,
+    )
 
-    if not await is_chat_member(db, user_id, chat_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
 
-    message = Message(chat_id=chat_id, sender_id=user_id, content=msg.content, attachment_url=msg.imageUrl)
-    db.add(message)
+@router.get("/{chat_id}/messages", response_model=MessagePage)
+async def get_messages(
+    request: Request,
+    chat_id: int,
+    before: int | None = None,
+    after: int | None = None,
+    limit: int = Query(settings.message_page_size, ge=1, le=settings.message_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
+    """A page of chat history; the newest messages unless `before`/`after` message ids are given."""
+    user_id = get_current_user(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    await require_chat_member(db, user_id, chat_id)
+    return await message_page(db, chat_id, user_id, before, after, limit)
+
+
+@router.post("/{chat_id}/messages/import")
+async def import_chat_messages(chat_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Bulk-load message history into a chat, e.g. when migrating from another chat system.
+
+    Operator-only: the request must carry `settings.message_import_token` in the
+    X-Import-Token header, since an import writes messages on behalf of any member.
+    The body is either a JSON array of messages or, for large imports, a stream of
+    newline-delimited JSON (Content-Type: application/x-ndjson). Messages are not broadcast.
+    """
+    token = request.headers.get("x-import-token", "")
+    if not settings.message_import_token or not secrets.compare_digest(
+        token.encode(), settings.message_import_token.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Message import requires the operator import token")
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        messages = parse_ndjson_messages(request.stream())
+    else:
+        messages = parse_message_array(await request.body())
+
+    imported = await import_messages(db, chat_id, await chat_member_ids(db, chat_id), messages)
     await db.commit()
+    return {"imported": imported}
 
-    # Ensure sender is loaded for broadcasting
-    result = await db.execute(
-        select(Message).options(selectinload(Message.sender)).where(Message.id == message.id)
+
+@router.get("/{chat_id}/messages/export")
+async def export_chat_messages(
+    chat_id: int,
+    request: Request,
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """Download the chat's whole history as newline-delimited JSON, gzipped if `gzip` is set."""
+    user_id = get_current_user(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    await require_chat_member(db, user_id, chat_id)
+
+    filename = f"chat-{chat_id}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_messages(chat_id, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    full_message = result.scalars().first()
 
-    # Broadcast to chat members (best-effort; failures won't break the request)
-    try:
-        from .websocket import manager
-        if full_message:
-            await manager.broadcast_chat_message(db, full_message)
-    except Exception:
-        # don't block sending on ws errors
-        pass
 
-    await db.refresh(message)
-    return message
+@router.get("/{chat_id}/messages/search", response_model=MessageSearchPage)
+async def search_chat_messages(
+    request: Request,
+    chat_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.search_page_size, ge=1, le=settings.search_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
+    """Search one chat's messages, best matches first."""
+    user_id = get_current_user(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    await require_chat_member(db, user_id, chat_id)
+    return await search_messages(db, user_id, q, chat_id, offset, limit)
 
 
-@router.get("/{chat_id}/messages", response_model=List[MessageSend])
-async def get_messages(request: Request, chat_id: int, db: AsyncSession = Depends(get_db)):
+@router.post("/{chat_id}/read", status_code=204)
+async def mark_chat_read(chat_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Mark every message in the chat as read for the current user."""
     user_id = get_current_user(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    result = await db.execute(select(Chat).where(Chat.id == chat_id))
-    chat = result.scalars().first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    if not await is_chat_member(db, user_id, chat_id):
+
+    if not await mark_read(db, chat_id, user_id):
         raise HTTPException(status_code=403, detail="Forbidden")
-    result = await db.execute(
-        select(Message)
-        .options(selectinload(Message.sender))
-        .where(Message.chat_id == chat_id)
-        .order_by(Message.created_at.asc()
-        )
-    )
-    messages = result.scalars().all()
-    res = []
-    for m in messages:
-        direction = 'recieved'
-        if user_id == m.sender_id:
-            direction = 'send'
-        res.append(MessageSend(
-            direction=direction,
-            name=m.sender.username,
-            message=m.content,
-            time=m.created_at,
-            imageUrl=m.attachment_url,
-            avatarUrl=m.sender.avatar_url
-        ))
-    return res
+    await db.commit()
+    return Response(status_code=204)
 
 
 @router.post("/{chat_id}/members")
@@ -311,28 +335,25 @@ async def add_chat_member(
     if len(users) != len(set(members.members)):
         raise HTTPException(status_code=404, detail="One or more users not found")
 
-    # Get existing chat members
-    result = await db.execute(
-        select(ChatMember.user_id).where(ChatMember.chat_id == chat_id)
-    )
-    existing_user_ids = set(result.scalars().all())
-
-    new_members = []
-    for user in users:
-        if user.id == current_user:
-            continue  # do not add yourself
-        if user.id in existing_user_ids:
-            continue  # already in chat
+    new_members = [
+        {"chat_id": chat_id, "user_id": user.id}
+        for user in users
+        if user.id != current_user  # do not add yourself
+    ]
 
-        new_members.append(
-            ChatMember(chat_id=chat_id, user_id=user.id)
+    # users already in the chat hit the (chat_id, user_id) primary key and are skipped
+    added = []
+    if new_members:
+        result = await db.execute(
+            insert(ChatMember).values(new_members).on_conflict_do_nothing().returning(ChatMember.user_id)
         )
+        added = result.scalars().all()
 
-    if not new_members:
+    if not added:
         return {"message": "No new users were added"}
 
-    db.add_all(new_members)
     await db.commit()
+    await invalidate_chat_members([chat_id])
 
     return {"message": "Users added to chat successfully"}
 
@@ -364,5 +385,6 @@ async def leave_chat(chat_id: int, request: Request, db: AsyncSession = Depends(
     else:
         await db.delete(chat_member)
     await db.commit()
+    await invalidate_chat_members([chat_id])
 
     return {"message": "You have left the chat successfully"}
@@ -1,11 +1,17 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, Response, Request, HTTPException
+from fastapi import APIRouter, Depends, Response, Request, HTTPException, Query
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..schemas import CommentRead, CommentCreate
+from ..config import settings
+from ..schemas import CommentRead, CommentCreate, CommentPage
 from ..models import User, Post, Comment
 from ..db import get_db
+from ..services.comment_queries import comment_page_query
+from ..services.counters import bump_comment_count
+from ..services.pagination import split_page
+from ..services.read_models import row_to_comment
 from ..services.session_manager import get_current_user
 from sqlalchemy.future import select
 
@@ -34,6 +40,7 @@ async def create_comment(
     )
 
     db.add(comment)
+    await db.execute(bump_comment_count(data.postId, 1))
     await db.commit()
     await db.refresh(comment)
 
@@ -51,28 +58,17 @@ async def create_comment(
     )
 
 
-@router.get("/{post_id}", response_model=list[CommentRead])
-async def list_comments(post_id: int, db: AsyncSession = Depends(get_db)):
-    query = (
-        select(Comment)
-        .where(Comment.post_id == post_id)
-        .order_by(Comment.created_at.desc())
-    )
-    result = await db.execute(query)
-    comments = result.scalars().all()
-
-    return [
-        CommentRead(
-            id=c.id,
-            postId=c.post_id,
-            userId=c.author.id,
-            username=c.author.username,
-            avatarUrl=c.avatar_url,
-            content=c.content,
-            createdAt=c.created_at,
-        )
-        for c in comments
-    ]
+@router.get("/{post_id}", response_model=CommentPage)
+async def list_comments(
+    post_id: int,
+    cursor: str | None = None,
+    limit: int = Query(settings.feed_page_size, ge=1, le=settings.feed_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(comment_page_query(post_id, cursor, limit))
+    rows, next_cursor = split_page(result.all(), limit)
+
+    return CommentPage(comments=[row_to_comment(r) for r in rows], nextCursor=next_cursor)
 
 
 @router.delete("/{comment_id}")
@@ -95,7 +91,13 @@ async def delete_comment(
     if comment.author_id != user_id:
         raise HTTPException(status_code=403, detail="Cannot delete this comment")
 
-    await db.delete(comment)
+    # A concurrent delete may have removed it since; only the one that did decrements the counter
+    result = await db.execute(delete(Comment).where(Comment.id == comment_id).returning(Comment.post_id))
+    deleted = result.first()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+
+    await db.execute(bump_comment_count(deleted.post_id, -1))
     await db.commit()
 
     return Response(status_code=204)
\ No newline at end of file
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, Response, Request, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..schemas import FriendCreate, FriendRead, FriendStatus
 from ..models import Friend, User
 from ..db import get_db
+from ..services.friend_queries import accepted_friends, friend_pair, sent_requests, subscribers
 from ..services.session_manager import create_session, get_current_user
+from ..services.timeline import link_friends, unlink_friends
 from sqlalchemy.future import select
 
 router = APIRouter(prefix="/friend", tags=["friend"])
 
 async def get_friend(db, user_id, friend_id):
-    result = await db.execute(select(Friend).where(Friend.user_id == user_id).where(Friend.friend_id == friend_id))
+    result = await db.execute(friend_pair(user_id, friend_id))
     friend = result.scalars().first()
     return friend
 
@@ -27,19 +30,21 @@ async def create_friend(friend: FriendCreate, request: Request, db: AsyncSession
     if not user.scalars().first():
         raise HTTPException(status_code=400)
 
-    post_friend = await get_friend(db, user_id, friend.friendId)
     my_friend = await get_friend(db, friend.friendId, user_id)
 
-    if post_friend or my_friend and my_friend.status == "accepted":
+    friend_obj = Friend(user_id=user_id, friend_id=friend.friendId, status="accepted" if my_friend else "pending")
+    db.add(friend_obj)
+    # a second request for the same pair violates uq_friends_user_id_friend_id
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Request has already been sent")
 
     if my_friend:
-        friend_obj = Friend(user_id=user_id, friend_id=friend.friendId, status="accepted")
         my_friend.status = "accepted"
-    else:
-        friend_obj = Friend(user_id=user_id, friend_id=friend.friendId, status="pending")
+        await link_friends(db, user_id, friend.friendId)
 
-    db.add(friend_obj)
     await db.commit()
     await db.refresh(friend_obj)
     return friend_obj
@@ -60,6 +65,7 @@ async def delete_friend(friend_id: int, request: Request, db: AsyncSession = Dep
         await db.delete(friend_link)
     if reverse_link:
         await db.delete(reverse_link)
+    await unlink_friends(db, user_id, friend_id)
 
     await db.commit()
     return Response(status_code=204)
@@ -71,9 +77,7 @@ async def list_friends(user_id: int, request: Request, db: AsyncSession = Depend
     # if not current_user:
     #     raise HTTPException(status_code=401, detail="Not authenticated")
 
-    result = await db.execute(
-        select(Friend).where(Friend.user_id == user_id).where(Friend.status == "accepted")
-    )
+    result = await db.execute(accepted_friends(user_id))
     friends = result.scalars().all()
 
     return [
@@ -88,9 +92,7 @@ async def list_following(user_id: int, request: Request, db: AsyncSession = Depe
     # if not current_user:
     #     raise HTTPException(status_code=401, detail="Not authenticated")
 
-    result = await db.execute(
-        select(Friend).where(Friend.friend_id == user_id).where(Friend.status == "pending")
-    )
+    result = await db.execute(subscribers(user_id))
     subs = result.scalars().all()
 
     return [
@@ -104,9 +106,7 @@ async def list_requests(user_id: int, request: Request, db: AsyncSession = Depen
     # if not current_user:
     #     raise HTTPException(status_code=401, detail="Not authenticated")
 
-    result = await db.execute(
-        select(Friend).where(Friend.user_id == user_id).where(Friend.status == "pending")
-    )
+    result = await db.execute(sent_requests(user_id))
     subs = result.scalars().all()
 
     return [
@@ -116,12 +116,8 @@ async def list_requests(user_id: int, request: Request, db: AsyncSession = Depen
 
 @router.get("/status/{user_id}/{friend_id}", response_model=FriendStatus)
 async def get_friendship_status(user_id: int, friend_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Friend).where(Friend.user_id == user_id, Friend.friend_id == friend_id)
-    )
-    result2 = await db.execute(
-        select(Friend).where(Friend.user_id == user_id, Friend.friend_id == friend_id)
-    )
+    result = await db.execute(friend_pair(user_id, friend_id))
+    result2 = await db.execute(friend_pair(user_id, friend_id))
     friend = result.scalars().first()
     friend2 = result2.scalars().first()
 
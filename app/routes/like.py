@@ -1,13 +1,16 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, Request, HTTPException, Response
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from ..db import get_db
 from ..models import Like, Post
 from ..schemas import LikeCreate, LikeRead
+from ..services.counters import bump_like_count
 from ..services.session_manager import get_current_user
+from ..services.viewer_state import unlike_query
 
 router = APIRouter(prefix="/likes", tags=["likes"])
 
@@ -27,18 +30,19 @@ async def create_like(
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    # Prevent duplicate likes from the same user
+    # Duplicate likes are rejected by uq_likes_post_id_author_id
     result = await db.execute(
-        select(Like).where(Like.post_id == data.postId, Like.author_id == user_id)
+        insert(Like)
+        .values(post_id=data.postId, author_id=user_id)
+        .on_conflict_do_nothing(constraint="uq_likes_post_id_author_id")
+        .returning(Like)
     )
-    existing = result.scalars().first()
-    if existing:
+    like = result.scalars().first()
+    if not like:
         raise HTTPException(status_code=400, detail="Already liked")
 
-    like = Like(post_id=data.postId, author_id=user_id)
-    db.add(like)
+    await db.execute(bump_like_count(data.postId, 1))
     await db.commit()
-    await db.refresh(like)
 
     return LikeRead(
         id=like.id,
@@ -76,15 +80,12 @@ async def delete_like(
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    result = await db.execute(
-        select(Like).where(Like.post_id == post_id, Like.author_id == user_id)
-    )
-    like = result.scalars().first()
-
-    if not like:
+    # Only the request whose DELETE removed the row decrements the counter
+    result = await db.execute(unlike_query(user_id, post_id))
+    if result.first() is None:
         raise HTTPException(status_code=404, detail="Like not found")
 
-    await db.delete(like)
+    await db.execute(bump_like_count(post_id, -1))
     await db.commit()
 
     return Response(status_code=204)
@@ -1,12 +1,15 @@
-from typing import List
-
-from fastapi import APIRouter, Depends, Response, Request, HTTPException
+from fastapi import APIRouter, Depends, Response, Request, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from ..schemas import PostRead, PostCreate, PostUpdate, CommentRead
-from ..models import Post, Comment
+from ..config import settings
+from ..schemas import PostRead, PostCreate, PostUpdate, PostPage
+from ..models import Post
 from ..db import get_db
+from ..services.etag import check_etag, make_etag
+from ..services.pagination import keyset_page, split_page
+from ..services.post_serializer import render_posts
+from ..services.read_models import post_versions
+from ..services.timeline import fan_out_post, home_page, remove_post
 from ..services.session_manager import get_current_user
 from sqlalchemy.future import select
 
@@ -21,6 +24,8 @@ async def create_post(post: PostCreate, request: Request, db: AsyncSession = Dep
 
     post_obj = Post(author_id=user_id, content=post.content, image_url=post.imgUrl)
     db.add(post_obj)
+    await db.flush()
+    await fan_out_post(db, post_obj)
     await db.commit()
     await db.refresh(post_obj)
     res = PostRead(
@@ -38,100 +43,56 @@ async def create_post(post: PostCreate, request: Request, db: AsyncSession = Dep
     return res
 
 
-@router.get("/", response_model=List[PostRead])
-async def list_posts(request: Request, db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=PostPage)
+async def list_posts(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(settings.feed_page_size, ge=1, le=settings.feed_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
     user_id = get_current_user(request)
-    result = await db.execute(
-        select(Post)
-        .options(
-            selectinload(Post.comments).selectinload(Comment.author),
-            selectinload(Post.author),
-            selectinload(Post.likes),
-        )
-        .order_by(Post.created_at.desc())
-    )
-
-    posts = result.scalars().all()
-
-    res = []
-    for post in posts:
-        comments_list = [
-            CommentRead(
-                id=c.id,
-                postId=c.post_id,
-                userId=c.author_id,
-                username=c.author.username,
-                avatarUrl=c.author.avatar_url,
-                content=c.content,
-                createdAt=c.created_at
-            )
-            for c in post.comments
-        ]
-
-        is_liked = False
-        if user_id and hasattr(post, 'likes'):
-            for l in post.likes:
-                if getattr(l, 'author_id', None) == user_id:
-                    is_liked = True
-                    break
-
-        res.append(
-            PostRead(
-                id=post.id,
-                user=post.author.username,
-                userId=post.author.id,
-                postTime=post.created_at,
-                text=post.content,
-                avatarUrl=post.author.avatar_url,
-                image=post.image_url,
-                likes=len(post.likes) if hasattr(post, 'likes') else 0,
-                isLiked=is_liked,
-                comments=comments_list,
-            )
-        )
+    result = await db.execute(keyset_page(post_versions(), Post.created_at, Post.id, cursor, limit))
+
+    rows, next_cursor = split_page(result.all(), limit)
+    not_modified = check_etag(request, response, make_etag("feed", user_id, [tuple(r) for r in rows], next_cursor))
+    if not_modified:
+        return not_modified
+    return PostPage(posts=await render_posts(db, rows, user_id), nextCursor=next_cursor)
+
+
+@router.get("/home", response_model=PostPage)
+async def home_timeline(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(settings.feed_page_size, ge=1, le=settings.feed_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
+    """Posts from the current user and their accepted friends, newest first."""
+    user_id = get_current_user(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
 
-    return res
+    rows, next_cursor = await home_page(db, user_id, cursor, limit)
+    return PostPage(posts=await render_posts(db, rows, user_id), nextCursor=next_cursor)
 
 
 @router.get("/{post_id}", response_model=PostRead)
-async def get_post(post_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+async def get_post(post_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """One post with the same comment preview as the feed; the full thread is paged by GET /comments/{post_id}."""
     user_id = get_current_user(request)
-    result = await db.execute(select(Post).where(Post.id == post_id).where(Post.is_published == True).options(selectinload(Post.comments).selectinload(Comment.author), selectinload(Post.likes), selectinload(Post.author)))
-    post = result.scalars().first()
-    if not post:
+    result = await db.execute(post_versions().where(Post.id == post_id).where(Post.is_published == True))
+    version = result.first()
+    if not version:
         raise HTTPException(status_code=404, detail="Post not found")
-    comments_list = [
-        CommentRead(
-            id=c.id,
-            postId=c.post_id,
-            userId=c.author_id,
-            username=c.author.username,
-            avatarUrl=c.author.avatar_url,
-            content=c.content,
-            createdAt=c.created_at
-        )
-        for c in post.comments
-    ]
-
-    is_liked = False
-    if user_id and hasattr(post, 'likes'):
-        for l in post.likes:
-            if getattr(l, 'author_id', None) == user_id:
-                is_liked = True
-                break
-
-    return PostRead(
-        id=post.id,
-        user=post.author.username,
-        userId=post.author.id,
-        postTime=post.created_at,
-        avatarUrl=post.author.avatar_url,
-        text=post.content,
-        image=post.image_url,
-        likes=len(post.likes) if hasattr(post, 'likes') else 0,
-        isLiked=is_liked,
-        comments=comments_list,
-    )
+    not_modified = check_etag(request, response, make_etag("post", user_id, post_id, tuple(version)))
+    if not_modified:
+        return not_modified
+
+    posts = await render_posts(db, [version], user_id)
+    if not posts:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return posts[0]
 
 
 @router.patch("/{post_id}")
@@ -163,6 +124,7 @@ async def delete_post(post_id: int, request: Request, db: AsyncSession = Depends
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
+    await remove_post(db, post.id)
     await db.delete(post)
     await db.commit()
     return Response(status_code=204)
@@ -1,13 +1,18 @@
-from typing import List
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, Response, Request, HTTPException
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, Response, Request, HTTPException, Query
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
+from ..config import settings
 from ..schemas import UserCreate, UserRead, PostRead, PostCreate, CommentRead, UserUpdateAvatar
 from ..models import User, Post, Comment, Friend, ImageUser
 from ..db import get_db
+from ..services.etag import check_etag, make_etag
+from ..services.pagination import keyset_page, split_page
+from ..services.user_profiles import invalidate_profiles
+from ..services.post_serializer import render_posts
+from ..services.read_models import post_versions, profile_header_rows
 from ..services.session_manager import create_session, get_current_user
 from sqlalchemy.future import select
 from passlib.hash import bcrypt
@@ -15,130 +20,68 @@ from ..common import hash_password, check_password
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
+async def build_profile(
+    db: AsyncSession,
+    request: Request,
+    response: Response,
+    user_id: int,
+    viewer_id: int | None,
+    cursor: str | None,
+    limit: int,
+):
+    """Shared body of the self and public profile views; private photos count only for the owner."""
+    result = await db.execute(profile_header_rows(user_id, include_private=viewer_id == user_id))
+    header = result.first()
+    if not header:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    query = post_versions().where(Post.author_id == user_id)
+    posts = await db.execute(keyset_page(query, Post.created_at, Post.id, cursor, limit))
+    posts, next_cursor = split_page(posts.all(), limit)
+
+    etag = make_etag("profile", viewer_id, tuple(header), [tuple(post) for post in posts], next_cursor)
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    res_post = await render_posts(db, posts, viewer_id)
+
+    return {
+        "userId": header.id,
+        "name": header.username,
+        "avatarUrl": header.avatar_url,
+        "friendCount": header.friend_count,
+        "photoCount": header.photo_count,
+        "subscriberCount": header.subscriber_count,
+        "posts": res_post,
+        "nextCursor": next_cursor,
+    }
+
+
 @router.get("/")
-async def profile(request: Request, db: AsyncSession = Depends(get_db)):
+async def profile(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(settings.feed_page_size, ge=1, le=settings.feed_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
     user_id = get_current_user(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    result = await db.execute(select(User).where(User.id == user_id))
-    posts = await db.execute(select(Post).options(
-            selectinload(Post.comments).selectinload(Comment.author),
-            selectinload(Post.author),
-            selectinload(Post.likes),
-        )
-        .where(Post.author_id == user_id))
-    user = result.scalars().first()
-    res_post = []
-    for post in posts.scalars().all():
-        comments_list = [
-            CommentRead(
-                id=c.id,
-                postId=c.post_id,
-                userId=c.author_id,
-                username=c.author.username,
-                avatarUrl=c.author.avatar_url,
-                content=c.content,
-                createdAt=c.created_at
-            )
-            for c in post.comments
-        ]
-
-        res_post.append(
-            PostRead(
-                id=post.id,
-                user=post.author.username,
-                userId=post.author.id,
-                postTime=post.created_at,
-                avatarUrl=post.author.avatar_url,
-                text=post.content,
-                image=post.image_url,
-                likes=len(post.likes) if hasattr(post, 'likes') else 0,
-                isLiked=any(getattr(l, 'author_id', None) == user_id for l in post.likes) if hasattr(post, 'likes') else False,
-                comments=comments_list,
-            )
-        )
-
-    # compute friend and subscriber counts
-    friends_res = await db.execute(select(Friend).where(Friend.user_id == user.id).where(Friend.status == "accepted"))
-    friend_count = len(friends_res.scalars().all())
-
-    subs_res = await db.execute(select(Friend).where(Friend.friend_id == user.id).where(Friend.status == "pending"))
-    subscriber_count = len(subs_res.scalars().all())
-
-    images_query = await db.execute(select(ImageUser).where(ImageUser.user_id == user.id))
-    images_count = len(images_query.scalars().all())
-
-    res = {
-        "userId": user.id,
-        "name": user.username,
-        "avatarUrl": user.avatar_url,
-        "friendCount": friend_count,
-        "photoCount": images_count,
-        "subscriberCount": subscriber_count,
-        "posts": res_post
-    }
-    return res
+    return await build_profile(db, request, response, user_id, user_id, cursor, limit)
 
 
 @router.get("/{user_id}")
-async def other_profile(user_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).where(User.id == user_id))
-    posts = await db.execute(select(Post).options(
-            selectinload(Post.comments).selectinload(Comment.author),
-            selectinload(Post.author),
-            selectinload(Post.likes),
-        )
-        .where(Post.author_id == user_id))
-    user = result.scalars().first()
-    res_post = []
-    for post in posts.scalars().all():
-        comments_list = [
-            CommentRead(
-                id=c.id,
-                postId=c.post_id,
-                userId=c.author_id,
-                username=c.author.username,
-                avatarUrl=c.author.avatar_url,
-                content=c.content,
-                createdAt=c.created_at
-            )
-            for c in post.comments
-        ]
-
-        res_post.append(
-            PostRead(
-                id=post.id,
-                user=post.author.username,
-                userId=post.author.id,
-                postTime=post.created_at,
-                avatarUrl=post.author.avatar_url,
-                text=post.content,
-                image=post.image_url,
-                likes=len(post.likes) if hasattr(post, 'likes') else 0,
-                isLiked=any(getattr(l, 'author_id', None) == user_id for l in post.likes) if hasattr(post, 'likes') else False,
-                comments=comments_list,
-            )
-        )
-
-    friends_res = await db.execute(select(Friend).where(Friend.user_id == user.id).where(Friend.status == "accepted"))
-    friend_count = len(friends_res.scalars().all())
-
-    subs_res = await db.execute(select(Friend).where(Friend.friend_id == user.id).where(Friend.status == "pending"))
-    subscriber_count = len(subs_res.scalars().all())
-
-    images_query = await db.execute(select(ImageUser).where(and_(ImageUser.user_id == user.id, ImageUser.private == False)))
-    images_count = len(images_query.scalars().all())
-
-    res = {
-        "userId": user.id,
-        "name": user.username,
-        "avatarUrl": user.avatar_url,
-        "friendCount": friend_count,
-        "photoCount": images_count,
-        "subscriberCount": subscriber_count,
-        "posts": res_post
-    }
-    return res
+async def other_profile(
+    user_id: int,
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(settings.feed_page_size, ge=1, le=settings.feed_max_page_size),
+    db: AsyncSession = Depends(get_db),
+):
+    return await build_profile(db, request, response, user_id, get_current_user(request), cursor, limit)
 
 @router.post("/avatar")
 async def avatar_upload(post: UserUpdateAvatar, request: Request, db: AsyncSession = Depends(get_db)):
@@ -148,6 +91,20 @@ async def avatar_upload(post: UserUpdateAvatar, request: Request, db: AsyncSessi
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.avatar_url = post.avatarUrl
+
+    # rendered posts embed the avatar of the post author and of comment authors;
+    # bumping updated_at moves them to a new post cache key and a new ETag
+    affected = select(Post.id).where(Post.author_id == user_id).union(
+        select(Comment.post_id).where(Comment.author_id == user_id)
+    )
+    await db.execute(
+        update(Post)
+        .where(Post.id.in_(affected))
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
     await db.commit()
     await db.refresh(user)
+    await invalidate_profiles([user_id])
     return {"message": "Avatar updated successfully", "avatarUrl": post.avatarUrl}
\ No newline at end of file
@@ -1,115 +1,403 @@
 import asyncio
-import json
-from typing import Dict, Set, Optional
+import logging
+import time
+from typing import Dict, Iterable, Set, Optional
 
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from pydantic import TypeAdapter, ValidationError
 
-from ..models import ChatMember, User, Message
+from ..config import settings
+from ..db import AsyncSessionLocal
+from ..schemas import AckFrame, ClientFrame, PingFrame, ResumeFrame, SubscribeFrame, UnsubscribeFrame
+from ..services.broadcast_bus import chat_channel, make_bus, user_channel
+from ..services.event_log import make_event_log, with_seq
+from ..services.message_history import messages_since
 from ..services.session_manager import get_user_id
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/ws", tags=["websocket"])  # optional prefix for documentation
 
+def encode(data: dict) -> str:
+    """Serialize an outbound frame; orjson is several times faster than json on this hot path."""
+    return orjson.dumps(data).decode()
+
+
+client_frame = TypeAdapter(ClientFrame)
+PING = encode({"type": "ping"})
+PONG = encode({"type": "pong"})
+MAX_DEVICE_ID_LENGTH = 64
+
+
+def message_event(message, sender) -> dict:
+    """Bus event for a chat message: a `message_rows`-shaped row and its sender's profile."""
+    return {
+        "senderId": message.sender_id,
+        "chatId": message.chat_id,
+        "message": {
+            "id": message.id,
+            "name": sender.username,
+            "message": message.content,
+            "time": message.created_at.isoformat(),
+            "imageUrl": message.attachment_url,
+            "avatarUrl": sender.avatar_url
+        },
+    }
+
+
+def message_frames(event: dict) -> dict[str, str]:
+    """The encoded frame for the sender ("send") and for everyone else ("recieved")."""
+    return {
+        direction: encode({
+            "type": "message",
+            "payload": {
+                "chatId": event["chatId"],
+                "message": {"direction": direction, **event["message"]},
+            },
+        })
+        for direction in ("send", "recieved")
+    }
+
+
+class Connection:
+    """One accepted socket with a bounded outbound queue drained by its own writer task.
+
+    Senders only enqueue, so a slow client backs up its own queue instead of
+    stalling whoever is broadcasting. A client that cannot keep up (full queue,
+    backlog above `ws_slow_queue_threshold` for `ws_slow_consumer_grace` seconds, or a
+    send taking over `ws_send_timeout`) is evicted so it reconnects and catches up.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: Optional[int], manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(settings.ws_send_queue_size)
+        self._manager = manager
+        self._backlogged_since: Optional[float] = None
+        self.evicted = False
+        self.connected_at = self.last_seen = time.monotonic()
+        # set by the first valid client frame; only such clients answer the heartbeat ping
+        self.speaks_protocol = False
+        # chat ids this connection wants messages for; None means all of the user's chats
+        self.subscriptions: Optional[Set[int]] = None
+        # client-chosen id (?deviceId=) under which acks are kept across reconnects
+        self.device_id: Optional[str] = websocket.query_params.get("deviceId") or None
+        if self.device_id is not None:
+            self.device_id = self.device_id[:MAX_DEVICE_ID_LENGTH]
+        # highest event seq the client has acknowledged on this connection
+        self.acked_seq = 0
+        self._writer = asyncio.create_task(self._write())
+
+    def wants(self, chat_id: int) -> bool:
+        return self.subscriptions is None or chat_id in self.subscriptions
+
+    def enqueue(self, text: str) -> bool:
+        """Queue a frame for sending; False if the client is too slow and got evicted instead."""
+        if self.evicted:
+            return False
+        backlog = self.queue.qsize()
+        if backlog >= settings.ws_slow_queue_threshold:
+            now = time.monotonic()
+            if self._backlogged_since is None:
+                self._backlogged_since = now
+            elif now - self._backlogged_since > settings.ws_slow_consumer_grace:
+                self._manager.evict(self, "backlog stayed above threshold")
+                return False
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._manager.evict(self, "send queue full")
+            return False
+        return True
+
+    async def _write(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                if self.queue.qsize() < settings.ws_slow_queue_threshold:
+                    self._backlogged_since = None
+                async with self._manager.send_slots:
+                    await asyncio.wait_for(self.websocket.send_text(text), settings.ws_send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._manager.evict(self, "send timed out")
+        except Exception:
+            # the socket is gone; unregister it
+            await self._manager.disconnect(self.websocket)
+
+    def close(self):
+        self._writer.cancel()
+
+
 class ConnectionManager:
     def __init__(self):
         # Map user_id -> set of WebSocket connections
         self.active_connections: Dict[Optional[int], Set[WebSocket]] = {}
+        # Reverse map websocket -> its Connection (which knows the user), for O(1) disconnect
+        self._connections: Dict[WebSocket, Connection] = {}
+        # guards the two dicts only; never held across network I/O
         self._lock = asyncio.Lock()
+        # sends in flight across all writers
+        self.send_slots = asyncio.Semaphore(settings.ws_max_concurrent_sends)
+        self.evicted_consumers = 0
+        self.reaped_connections = 0
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # events are published once to the bus and every worker delivers to its own sockets
+        self.bus = make_bus()
+        # per-user event seqs and recent frames, for resume after a reconnect
+        self.events = make_event_log()
+
+    async def start(self):
+        await self.bus.start(self._on_event)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await self.bus.stop()
+
+    async def _heartbeat(self):
+        """Ping protocol clients each `ws_heartbeat_interval`; close the ones silent past `ws_idle_timeout`.
+
+        Only connections that have sent a client frame are known to answer pings with
+        pongs. Clients that never speak the protocol are left to the server's WebSocket
+        control-frame pings (uvicorn --ws-ping-interval / --ws-ping-timeout, 20s each by
+        default), which close dead peers without the client's code taking part.
+        """
+        while True:
+            await asyncio.sleep(settings.ws_heartbeat_interval)
+            now = time.monotonic()
+            async with self._lock:
+                conns = [conn for conn in self._connections.values() if conn.speaks_protocol]
+            for conn in conns:
+                if now - conn.last_seen > settings.ws_idle_timeout:
+                    self.reaped_connections += 1
+                    asyncio.create_task(self._close(conn, 1001))  # going away
+                else:
+                    conn.enqueue(PING)
+
+    async def _on_event(self, channel: str, data: bytes | str):
+        event = orjson.loads(data)
+        if channel.startswith("ws:chat:"):
+            await self._deliver_chat_message(event)
+        elif channel.startswith("ws:user:"):
+            await self._deliver_to_user(event["userId"], event["frame"])
 
     async def connect(self, websocket: WebSocket):
+        """Accept and register the socket; returns its user id, or None if it was refused.
+
+        Anonymous sockets are closed. A user over `ws_max_connections_per_user` has their
+        oldest connections closed to make room.
+        """
         await websocket.accept()
         token = websocket.cookies.get("session_token")
         user_id = get_user_id(token) if token else None
+        if user_id is None:
+            await websocket.close(code=1008)  # policy violation
+            return None
+
+        conn = Connection(websocket, user_id, self)
         async with self._lock:
+            self._connections[websocket] = conn
             conns = self.active_connections.setdefault(user_id, set())
             conns.add(websocket)
+            surplus = len(conns) - settings.ws_max_connections_per_user
+            oldest = sorted((self._connections[ws] for ws in conns), key=lambda c: c.connected_at)[:max(surplus, 0)]
+        for old_conn in oldest:
+            asyncio.create_task(self._close(old_conn, 1008))
         return user_id
 
     async def disconnect(self, websocket: WebSocket):
         async with self._lock:
-            for user_id, conns in list(self.active_connections.items()):
-                if websocket in conns:
-                    conns.remove(websocket)
-                    if not conns:
-                        del self.active_connections[user_id]
-                    break
+            conn = self._connections.pop(websocket, None)
+            if conn is None:
+                return
+            conns = self.active_connections.get(conn.user_id)
+            if conns is not None:
+                conns.discard(websocket)
+                if not conns:
+                    del self.active_connections[conn.user_id]
+        conn.close()
+
+    def evict(self, conn: Connection, reason: str):
+        """Drop a slow consumer: unregister it and close its socket in the background."""
+        if conn.evicted or self._connections.get(conn.websocket) is not conn:
+            return  # already gone
+        conn.evicted = True
+        self.evicted_consumers += 1
+        logger.warning("evicting websocket of user %s: %s", conn.user_id, reason)
+        asyncio.create_task(self._close(conn, 1013))  # try again later
+
+    async def _close(self, conn: Connection, code: int):
+        await self.disconnect(conn.websocket)
+        try:
+            await asyncio.wait_for(conn.websocket.close(code=code), settings.ws_send_timeout)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "users": len(self.active_connections),
+            "evictedConsumers": self.evicted_consumers,
+            "reapedConnections": self.reaped_connections,
+        }
+
+    async def handle_frame(self, websocket: WebSocket, text: str):
+        """Apply one client frame; see `ClientFrame` for the protocol."""
+        conn = self._connections.get(websocket)
+        if conn is None:
+            return
+        conn.last_seen = time.monotonic()
+        try:
+            frame = client_frame.validate_json(text)
+        except ValidationError:
+            conn.enqueue(encode({"type": "error", "error": "invalid frame"}))
+            return
+        conn.speaks_protocol = True
+
+        if isinstance(frame, PingFrame):
+            conn.enqueue(PONG)
+        elif isinstance(frame, SubscribeFrame):
+            conn.subscriptions = (conn.subscriptions or set()) | set(frame.chatIds)
+            conn.enqueue(encode({"type": "subscribed", "chatIds": sorted(conn.subscriptions)}))
+        elif isinstance(frame, UnsubscribeFrame):
+            if conn.subscriptions is None:
+                conn.enqueue(encode({"type": "error", "error": "not subscribed to specific chats"}))
+                return
+            conn.subscriptions -= set(frame.chatIds)
+            conn.enqueue(encode({"type": "subscribed", "chatIds": sorted(conn.subscriptions)}))
+        elif isinstance(frame, AckFrame):
+            if frame.seq > conn.acked_seq:
+                conn.acked_seq = frame.seq
+                if conn.device_id is not None:
+                    await self.events.ack(conn.user_id, conn.device_id, frame.seq)
+        elif isinstance(frame, ResumeFrame):
+            last_seq = frame.lastSeq
+            if last_seq is None:
+                if conn.device_id is None:
+                    conn.enqueue(encode({"type": "error", "error": "lastSeq is required without a deviceId"}))
+                    return
+                last_seq = await self.events.acked(conn.user_id, conn.device_id)
+            await self.resume(conn, last_seq, frame.lastMessageId)
+        # PongFrame: refreshing last_seen is all it does
 
     async def send_personal(self, websocket: WebSocket, data: dict):
-        await websocket.send_text(json.dumps(data))
+        conn = self._connections.get(websocket)
+        if conn is not None:
+            conn.enqueue(encode(data))
 
     async def send_to_user(self, user_id: int, data: dict):
-        # send to all connections for this user
+        """Send `data` to every connection of the user, on whichever worker they are."""
+        frame = encode(data)
+        seq = (await self.events.append({user_id: frame}))[user_id]
+        await self.bus.publish(user_channel(user_id), orjson.dumps({"userId": user_id, "frame": with_seq(frame, seq)}))
+
+    async def _deliver_to_user(self, user_id: int, frame: str):
+        # queue for this worker's connections of the user; the writers do the sending
         async with self._lock:
-            conns = self.active_connections.get(user_id) or set()
-            for ws in list(conns):
-                try:
-                    await ws.send_text(json.dumps(data))
-                except Exception:
-                    # if send fails, remove that websocket
-                    conns.remove(ws)
-
-    async def broadcast_chat_message(self, db: AsyncSession, message: Message):
+            conns = [self._connections[ws] for ws in self.active_connections.get(user_id, ())]
+        for conn in conns:
+            conn.enqueue(frame)
+
+    async def broadcast_chat_message(self, message, sender, recipients: Iterable[int]):
         """Send a message to all members of the chat that message belongs to.
         The message will be formatted to match the shape returned by the `get_messages` endpoint
-        (fields: direction, name, message, time).
+        (fields: id, direction, name, message, time).
         Direction is computed per-recipient: 'send' for the sender, 'recieved' for others (keeps existing typo).
+        `message` is a row of the inserted message, `sender` its author's `UserProfile` and
+        `recipients` the chat's member ids. Each recipient's frame gets their next event seq and
+        is kept in the event log for resume; the event is then published once on the chat's channel.
         """
-        # Load sender username and chat members
-        result = await db.execute(select(Message).options(selectinload(Message.sender)).where(Message.id == message.id))
-        m = result.scalars().first()
-        if not m:
-            return
+        event = message_event(message, sender)
+        frames = message_frames(event)
+        seqs = await self.events.append({
+            uid: frames["send" if uid == event["senderId"] else "recieved"] for uid in set(recipients)
+        })
+        event["seqs"] = {str(uid): seq for uid, seq in seqs.items()}
+        await self.bus.publish(chat_channel(event["chatId"]), orjson.dumps(event))
+
+    async def _deliver_chat_message(self, event: dict):
+        seqs = {int(uid): seq for uid, seq in event["seqs"].items()}
+        async with self._lock:
+            conns = [
+                self._connections[ws]
+                for uid in seqs
+                for ws in self.active_connections.get(uid, ())
+                if self._connections[ws].wants(event["chatId"])
+            ]
+
+        # The frame differs per recipient only in `direction` and `seq`: encode both variants
+        # once and splice each user's seq onto the encoded text; writers deliver concurrently
+        frames = message_frames(event)
+        for conn in conns:
+            frame = frames["send" if conn.user_id == event["senderId"] else "recieved"]
+            conn.enqueue(with_seq(frame, seqs[conn.user_id]))
 
-        # Get chat members
-        result = await db.execute(select(ChatMember).where(ChatMember.chat_id == m.chat_id).options(selectinload(ChatMember.user)))
-        members = result.scalars().all()
-        recipients = [mem.user.id for mem in members]
-
-        # For each recipient, compute direction and send
-        for uid in recipients:
-            direction = "recieved" if uid != m.sender_id else "send"
-            payload = {
-                "type": "message",
-                "payload": {
-                    "chatId": m.chat_id,
-                    "message": {
-                        "direction": direction,
-                        "name": m.sender.username if m.sender else "Unknown",
-                        "message": m.content,
-                        "time": m.created_at.isoformat(),
-                        "imageUrl": m.attachment_url,
-                        "avatarUrl": m.sender.avatar_url
-                    },
-                },
-            }
-            await self.send_to_user(uid, payload)
+    async def resume(self, conn: Connection, last_seq: int, last_message_id: Optional[int]):
+        """Replay the events a reconnecting client missed after `last_seq`, then send `resumed`.
+
+        Served from the event log while it still holds them. Otherwise messages after
+        `last_message_id` come from the database (without seqs). If the client gave no
+        message id, or more than `ws_resume_max_messages` are missing, it is told to `resync`,
+        i.e. reload its chats.
+        """
+        current, frames = await self.events.since(conn.user_id, last_seq)
+        if frames is None:
+            if last_message_id is None:
+                conn.enqueue(encode({"type": "resync", "seq": current}))
+                return
+            async with AsyncSessionLocal() as db:
+                rows, senders, has_more = await messages_since(
+                    db, conn.user_id, last_message_id, settings.ws_resume_max_messages
+                )
+            if has_more:
+                conn.enqueue(encode({"type": "resync", "seq": current}))
+                return
+            frames = []
+            for row in rows:
+                event = message_event(row, senders[row.sender_id])
+                frames.append(message_frames(event)["send" if row.sender_id == conn.user_id else "recieved"])
+
+        for frame in frames:
+            if conn.subscriptions is None or conn.wants(orjson.loads(frame)["payload"]["chatId"]):
+                conn.enqueue(frame)
+        conn.enqueue(encode({"type": "resumed", "seq": current}))
 
 
 manager = ConnectionManager()
 
 
+@router.get("/stats")
+async def websocket_stats():
+    """Connection counts and the number of slow consumers evicted since startup."""
+    return manager.stats()
+
+
 @router.websocket("")
 async def websocket_endpoint(websocket: WebSocket):
-    """A simple websocket endpoint that registers the connection and keeps it alive.
+    """Push channel for chat events.
 
     The user's session token (cookie `session_token`) is used to associate the connection with a user id.
+    Clients send `ClientFrame`s: ping (answered with pong), pong (answer to the server's
+    heartbeat ping, which only clients that have sent a frame get), subscribe/unsubscribe
+    to narrow delivery to some chat ids, ack, and resume after a reconnect. A client that
+    connects with `?deviceId=<id>` has its acks kept per device, and may then resume
+    without `lastSeq` to replay from that device's last ack. Events carry a per-user `seq`; connections
+    subscribed to some chats only will see gaps in it.
     """
     user_id = await manager.connect(websocket)
+    if user_id is None:
+        return
     try:
         while True:
-            # Keep the connection alive; we don't expect clients to send messages for now.
-            data = await websocket.receive_text()
-            # Optionally, you can handle client messages here (e.g., pings or subscription requests)
-            # We'll ignore/echo
-            try:
-                parsed = json.loads(data)
-            except Exception:
-                parsed = {"type": "raw", "data": data}
-            await manager.send_personal(websocket, {"type": "echo", "payload": parsed})
+            await manager.handle_frame(websocket, await websocket.receive_text())
     except WebSocketDisconnect:
-        await manager.disconnect(websocket)
+        pass
     except Exception:
-        # on any error just disconnect
+        logger.exception("websocket of user %s failed", user_id)
+    finally:
         await manager.disconnect(websocket)
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # --- USER ---
@@ -42,6 +42,11 @@ class CommentRead(BaseModel):
     createdAt: datetime
 
 
+class CommentPage(BaseModel):
+    comments: list[CommentRead]
+    nextCursor: str | None = None
+
+
 # --- POST ---
 class PostCreate(BaseModel):
     content: str
@@ -59,6 +64,11 @@ class PostRead(BaseModel):
     likes: int
     isLiked: bool
     comments: list[CommentRead] | list[str]
+    commentCount: int = 0
+
+class PostPage(BaseModel):
+    posts: list[PostRead]
+    nextCursor: str | None = None
 
 class PostUpdate(BaseModel):
     text: str | None = None
@@ -90,6 +100,7 @@ class ChatSend(BaseModel):
     chatTime: datetime
     chatBadge: str | None = None
     chatMembers: list[ChatMemberSend] | None = None
+    unreadCount: int = 0
 
 
 # --- MESSAGE ---
@@ -98,6 +109,13 @@ class MessageCreate(BaseModel):
     imageUrl: str | None = None
 
 
+class MessageImport(BaseModel):
+    senderId: int
+    content: str | None = None
+    imageUrl: str | None = None
+    createdAt: datetime
+
+
 class MessageRead(BaseModel):
     id: int
     chat_id: int
@@ -109,6 +127,7 @@ class MessageRead(BaseModel):
 
 
 class MessageSend(BaseModel):
+    id: int | None = None
     direction: str
     name: str
     message: str
@@ -117,6 +136,22 @@ class MessageSend(BaseModel):
     avatarUrl: str | None = None
 
 
+class MessagePage(BaseModel):
+    messages: list[MessageSend]
+    hasMore: bool = False
+
+
+class MessageSearchHit(MessageSend):
+    chatId: int
+    # HTML-escaped content around the matches, with matched words wrapped in <mark></mark>
+    snippet: str
+
+
+class MessageSearchPage(BaseModel):
+    results: list[MessageSearchHit]
+    nextOffset: int | None = None
+
+
 # --- IMAGES ---
 class ImageRead(BaseModel):
     id: int
@@ -184,3 +219,42 @@ class SettingsUpdate(BaseModel):
 class GalleryItem(BaseModel):
     id: int
     url: str
+
+
+# --- WEBSOCKET CLIENT FRAMES ---
+class PingFrame(BaseModel):
+    type: Literal["ping"]
+
+
+class PongFrame(BaseModel):
+    type: Literal["pong"]
+
+
+class SubscribeFrame(BaseModel):
+    type: Literal["subscribe"]
+    chatIds: list[int]
+
+
+class UnsubscribeFrame(BaseModel):
+    type: Literal["unsubscribe"]
+    chatIds: list[int]
+
+
+class AckFrame(BaseModel):
+    type: Literal["ack"]
+    seq: int
+
+
+class ResumeFrame(BaseModel):
+    type: Literal["resume"]
+    # last event seq the client has; may be omitted by clients that connected with a deviceId
+    # and ack, in which case the device's last acked seq is used
+    lastSeq: int | None = None
+    # newest message the client has; lets the server fill gaps the event buffer no longer holds
+    lastMessageId: int | None = None
+
+
+ClientFrame = Annotated[
+    Union[PingFrame, PongFrame, SubscribeFrame, UnsubscribeFrame, AckFrame, ResumeFrame],
+    Field(discriminator="type"),
+]
@@ -0,0 +1,73 @@
+import datetime
+import time
+import uuid
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Chat, ChatMember, Message, User
+from .inbox import load_chats
+
+
+class QueryCounter:
+    """Counts statements sent to the database by a session while active."""
+
+    def __init__(self, db: AsyncSession):
+        self.engine = db.bind.sync_engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+async def _seed_inbox(db: AsyncSession, user_id: int, peer_id: int, chats: int):
+    result = await db.execute(
+        insert(Chat).returning(Chat.id),
+        [
+            {"name": f"bench-{i}", "is_group": True, "last_message_preview": "message 2",
+             "last_message_at": datetime.datetime.utcnow()}
+            for i in range(chats)
+        ],
+    )
+    chat_ids = result.scalars().all()
+    await db.execute(
+        insert(ChatMember),
+        [{"chat_id": c, "user_id": u} for c in chat_ids for u in (user_id, peer_id)],
+    )
+    await db.execute(
+        insert(Message),
+        [{"chat_id": c, "sender_id": peer_id, "content": f"message {n}"} for c in chat_ids for n in range(3)],
+    )
+
+
+async def bench_inbox(db: AsyncSession, sizes: list[int]) -> list[tuple[int, int, float]]:
+    """Seed inboxes of each size inside a rolled-back transaction and measure `load_chats`.
+
+    Returns (chats, queries, milliseconds) per size; the query count should not change with size.
+    """
+    res = []
+    try:
+        for size in sizes:
+            tag = uuid.uuid4().hex[:8]
+            user_id, peer_id = (await db.execute(
+                insert(User).returning(User.id),
+                [{"username": f"bench-{tag}-a"}, {"username": f"bench-{tag}-b"}],
+            )).scalars().all()
+            await _seed_inbox(db, user_id, peer_id, size)
+
+            with QueryCounter(db) as counter:
+                started = time.perf_counter()
+                chats = await load_chats(db, user_id)
+                elapsed = (time.perf_counter() - started) * 1000
+            assert len(chats) == size
+            res.append((size, counter.count, elapsed))
+    finally:
+        await db.rollback()
+    return res
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Union
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# every worker subscribes to all WebSocket channels and delivers to its own sockets
+CHANNEL_PATTERN = "ws:*"
+
+# events are JSON documents, as bytes or str
+Event = Union[bytes, str]
+Handler = Callable[[str, Event], Awaitable[None]]
+
+
+def chat_channel(chat_id: int) -> str:
+    return f"ws:chat:{chat_id}"
+
+
+def user_channel(user_id: int) -> str:
+    return f"ws:user:{user_id}"
+
+
+class InProcessBus:
+    """Hands published events straight to this worker's handler (single-worker setups)."""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def publish(self, channel: str, data: Event):
+        if self._handler is not None:
+            await self._handler(channel, data)
+
+    async def stop(self):
+        self._handler = None
+
+
+class RedisBus:
+    """Redis pub/sub: a publish reaches the handler of every subscribed worker.
+
+    When the subscription connection drops, the listener re-subscribes with exponential
+    backoff (`reconnect_delay` doubling up to `max_reconnect_delay` seconds). Events
+    published meanwhile are lost to this worker; clients notice the gap in event seqs
+    and resume. `client` lets tests pass an in-memory fake instead of connecting to `url`.
+    """
+
+    reconnect_delay = 0.5
+    max_reconnect_delay = 30.0
+
+    def __init__(self, url: str, client=None):
+        if client is None:
+            from redis import asyncio as aioredis
+
+            client = aioredis.from_url(url)
+        self._redis = client
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler):
+        await self._subscribe()
+        self._listener = asyncio.create_task(self._listen(handler))
+
+    async def _subscribe(self):
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(CHANNEL_PATTERN)
+
+    async def _close_pubsub(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def _listen(self, handler: Handler):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    logger.info("re-subscribed to %s", CHANNEL_PATTERN)
+                    delay = self.reconnect_delay
+                async for message in self._pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel, data = message["channel"], message["data"]
+                    try:
+                        await handler(channel.decode() if isinstance(channel, bytes) else channel, data)
+                    except Exception:
+                        logger.exception("failed to deliver event from %s", channel)
+                logger.warning("subscription to %s ended, reconnecting in %.1fs", CHANNEL_PATTERN, delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("subscription to %s failed, reconnecting in %.1fs", CHANNEL_PATTERN, delay)
+            await self._close_pubsub()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def publish(self, channel: str, data: Event):
+        await self._redis.publish(channel, data)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.punsubscribe(CHANNEL_PATTERN)
+            finally:
+                await self._close_pubsub()
+
+
+def make_bus():
+    """Build the broadcast bus selected by `settings.broadcast_backend`."""
+    if settings.broadcast_backend == "redis":
+        return RedisBus(settings.redis_url)
+    return InProcessBus()
@@ -0,0 +1,96 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable
+
+from ..config import settings
+
+
+class InMemoryCache:
+    """Per-process LRU cache holding at most `max_size` entries for `ttl` seconds each.
+
+    Values are kept as-is (no serialization), so callers must not mutate them.
+    Expired entries are dropped when they are next read or pushed out by the LRU.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        now = time.monotonic()
+        res = {}
+        for key in keys:
+            entry = self._data.get(key)
+            if entry is None:
+                continue
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                continue
+            self._data.move_to_end(key)
+            res[key] = value
+        return res
+
+    async def set_many(self, items: dict[str, Any]):
+        expires_at = time.monotonic() + self.ttl
+        for key, value in items.items():
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def delete_many(self, keys: Iterable[str]):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisCache:
+    """Shared cache in Redis; values are encoded with `dump` under `<namespace>:<key>`.
+
+    Entries expire after `ttl` seconds. The size limit and LRU eviction are left to
+    the server (`maxmemory` with `maxmemory-policy allkeys-lru`).
+    """
+
+    def __init__(self, url: str, namespace: str, ttl: int, dump: Callable = json.dumps, load: Callable = json.loads):
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(url)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.dump = dump
+        self.load = load
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self._redis.mget([self._key(k) for k in keys])
+        return {k: self.load(v) for k, v in zip(keys, values) if v is not None}
+
+    async def set_many(self, items: dict[str, Any]):
+        if not items:
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(key), self.dump(value), ex=self.ttl)
+            await pipe.execute()
+
+    async def delete_many(self, keys: Iterable[str]):
+        keys = [self._key(k) for k in keys]
+        if keys:
+            await self._redis.delete(*keys)
+
+
+def make_cache(namespace: str, max_size: int, ttl: int, dump: Callable = json.dumps, load: Callable = json.loads):
+    """Build a cache for `namespace` on the backend selected by `settings.cache_backend`.
+
+    `dump`/`load` convert values to and from what is stored in Redis.
+    """
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.redis_url, namespace, ttl, dump, load)
+    return InMemoryCache(max_size, ttl)
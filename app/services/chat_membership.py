@@ -0,0 +1,54 @@
+import json
+import secrets
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..config import settings
+from ..models import ChatMember
+from .cache import make_cache
+
+membership_cache = make_cache(
+    "chat_members",
+    settings.membership_cache_size,
+    settings.membership_cache_ttl,
+    dump=lambda member_ids: json.dumps(sorted(member_ids)),
+    load=lambda raw: frozenset(json.loads(raw)),
+)
+# current version token of each chat's member set; member sets are cached under "<chat_id>:<version>"
+membership_versions = make_cache("chat_members_version", settings.membership_cache_size, settings.membership_cache_ttl)
+
+
+def member_ids_query(chat_id: int):
+    return select(ChatMember.user_id).where(ChatMember.chat_id == chat_id)
+
+
+async def chat_member_ids(db: AsyncSession, chat_id: int) -> frozenset[int]:
+    """User ids of the chat's members, read through the membership cache.
+
+    Unknown chats come back as an empty set. A miss stores the set under the version
+    token it started from (creating one before reading the database), and
+    `invalidate_chat_members` drops the token, so a read racing with a membership
+    change can only write under a version nobody looks up again.
+    """
+    version_key = str(chat_id)
+    versions = await membership_versions.get_many([version_key])
+    version = versions.get(version_key)
+    if version is None:
+        version = secrets.token_hex(8)
+        await membership_versions.set_many({version_key: version})
+    else:
+        cached = await membership_cache.get_many([f"{chat_id}:{version}"])
+        if cached:
+            return cached[f"{chat_id}:{version}"]
+
+    result = await db.execute(member_ids_query(chat_id))
+    member_ids = frozenset(result.scalars().all())
+    await membership_cache.set_many({f"{chat_id}:{version}": member_ids})
+    return member_ids
+
+
+async def invalidate_chat_members(chat_ids: Iterable[int]):
+    """Retire the cached member sets; call after committing any change to the chats' members."""
+    await membership_versions.delete_many(str(chat_id) for chat_id in chat_ids)
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Chat, ChatMember, Message
+
+PREVIEW_LENGTH = 255
+
+
+async def record_message(db: AsyncSession, chat_id: int, sender_id: int, message_id: int, created_at: datetime, content: str | None):
+    """Update the chat summary and every member's unread state for a new message.
+
+    Meant to run in the same transaction as the message INSERT. Concurrent sends can
+    commit out of id order, so the summary and the sender's read position only ever
+    move forward: the UPDATE of a message older than the current summary is a no-op.
+    """
+    await db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id)
+        .where(or_(Chat.last_message_id.is_(None), Chat.last_message_id < message_id))
+        .values(
+            last_message_id=message_id,
+            last_message_at=created_at,
+            last_message_preview=(content or "")[:PREVIEW_LENGTH],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    is_sender = ChatMember.user_id == sender_id
+    await db.execute(
+        update(ChatMember)
+        .where(ChatMember.chat_id == chat_id)
+        .values(
+            last_read_message_id=case(
+                (is_sender, func.greatest(ChatMember.last_read_message_id, message_id)),
+                else_=ChatMember.last_read_message_id,
+            ),
+            unread_count=case((is_sender, 0), else_=ChatMember.unread_count + 1),
+            last_activity_at=func.greatest(ChatMember.last_activity_at, created_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def mark_read(db: AsyncSession, chat_id: int, user_id: int) -> bool:
+    """Mark everything up to the chat's last message as read; False if the user is not a member."""
+    last_message_id = select(Chat.last_message_id).where(Chat.id == chat_id).scalar_subquery()
+    result = await db.execute(
+        update(ChatMember)
+        .where(ChatMember.chat_id == chat_id, ChatMember.user_id == user_id)
+        .values(last_read_message_id=last_message_id, unread_count=0)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def refresh_chat_summary(db: AsyncSession, chat_id: int):
+    """Rebuild the chat summary from the chat's newest message, e.g. after a bulk import.
+
+    Newest means highest id, read from the end of (chat_id, id): ids follow createdAt
+    because imports must be in chronological order after the chat's existing messages.
+
+    Members' inbox position moves up to that message; unread counts are left alone, so
+    imported history arrives as read.
+    """
+    result = await db.execute(
+        select(Message.id, Message.created_at, Message.content)
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.id.desc())
+        .limit(1)
+    )
+    newest = result.first()
+    if newest is None:
+        return
+    await db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id)
+        .values(
+            last_message_id=newest.id,
+            last_message_at=newest.created_at,
+            last_message_preview=(newest.content or "")[:PREVIEW_LENGTH],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(ChatMember)
+        .where(ChatMember.chat_id == chat_id)
+        .values(last_activity_at=func.greatest(ChatMember.last_activity_at, newest.created_at))
+        .execution_options(synchronize_session=False)
+    )
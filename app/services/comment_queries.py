@@ -0,0 +1,55 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Comment, Post, User
+from ..schemas import CommentRead
+from .pagination import keyset_page
+from .read_models import comment_rows, row_to_comment
+
+
+def latest_comments_query(post_ids: list[int], per_post: int):
+    """Newest `per_post` comments of each post with their authors, one LATERAL subquery per post.
+
+    Each subquery reads only the first `per_post` entries of (post_id, created_at, id),
+    and authors are joined after the limit.
+    """
+    posts = select(Post.id).where(Post.id.in_(post_ids)).subquery()
+    latest = (
+        select(Comment.id, Comment.post_id, Comment.author_id, Comment.content, Comment.created_at)
+        .where(Comment.post_id == posts.c.id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(per_post)
+        .lateral()
+    )
+    return (
+        select(latest, User.username, User.avatar_url)
+        .select_from(posts)
+        .join(latest, true())
+        .join(User, User.id == latest.c.author_id)
+        .order_by(latest.c.post_id, latest.c.created_at.desc(), latest.c.id.desc())
+    )
+
+
+def comment_page_query(post_id: int, cursor: Optional[str], limit: int):
+    """One newest-first keyset page of a post's comments, walked on (post_id, created_at, id)."""
+    return keyset_page(comment_rows().where(Comment.post_id == post_id), Comment.created_at, Comment.id, cursor, limit)
+
+
+async def latest_comments(db: AsyncSession, post_ids: Iterable[int], per_post: int) -> dict[int, list[CommentRead]]:
+    """Newest `per_post` comments of each post, newest first.
+
+    One query for the whole page, so the cost does not grow with the number of
+    comments on a post.
+    """
+    post_ids = list(post_ids)
+    res = {post_id: [] for post_id in post_ids}
+    if not post_ids:
+        return res
+
+    result = await db.execute(latest_comments_query(post_ids, per_post))
+    for row in result.all():
+        res[row.post_id].append(row_to_comment(row))
+    return res
@@ -0,0 +1,30 @@
+from sqlalchemy import func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Comment, Like, Post
+
+
+def bump_like_count(post_id: int, delta: int):
+    return update(Post).where(Post.id == post_id).values(like_count=Post.like_count + delta)
+
+
+def bump_comment_count(post_id: int, delta: int):
+    return update(Post).where(Post.id == post_id).values(comment_count=Post.comment_count + delta)
+
+
+async def reconcile_post_counters(db: AsyncSession) -> int:
+    """Rebuild Post.like_count / Post.comment_count from the likes and comments tables.
+
+    Only rows that drifted are rewritten; returns the number of posts fixed.
+    """
+    likes = select(func.count(Like.id)).where(Like.post_id == Post.id).scalar_subquery()
+    comments = select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+    result = await db.execute(
+        update(Post)
+        .where(or_(Post.like_count != likes, Post.comment_count != comments))
+        .values(like_count=likes, comment_count=comments)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher:
+    """Runs fire-and-forget jobs on a background task, in submission order.
+
+    Used to take WebSocket fan-out off the request path. Jobs are zero-argument
+    coroutine functions; failures are logged and do not stop the worker. When
+    `max_pending` jobs are already queued, new ones are dropped.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def submit(self, job: Callable[[], Awaitable[None]]):
+        # the worker starts with the first job, on the running loop
+        if self._worker is None:
+            self._queue = asyncio.Queue(self.max_pending)
+            self._worker = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.warning("dispatcher queue is full, dropping job %r", job)
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await job()
+            except Exception:
+                logger.exception("dispatcher job %r failed", job)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        """Finish the queued jobs, then stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        self._queue = self._worker = None
+
+
+dispatcher = Dispatcher(settings.dispatcher_max_pending)
@@ -0,0 +1,24 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the version stamps that determine a response body."""
+    return 'W/"%s"' % hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 response if If-None-Match matches `etag`; otherwise stamp `response` and return None.
+
+    Bodies depend on the session cookie (isLiked, private photos), hence `private` and `Vary: Cookie`.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
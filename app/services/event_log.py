@@ -0,0 +1,157 @@
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from ..config import settings
+
+
+def with_seq(frame: str, seq: int) -> str:
+    """Add `"seq": seq` to an encoded JSON object without re-encoding it."""
+    return f'{frame[:-1]},"seq":{seq}}}'
+
+
+class _UserLog:
+    __slots__ = ("seq", "frames", "acks", "active_at")
+
+    def __init__(self, buffer_size: int):
+        self.seq = 0
+        self.frames: deque = deque(maxlen=buffer_size)
+        # device id -> highest seq that device acknowledged
+        self.acks: dict[str, int] = {}
+        self.active_at = 0.0
+
+
+class InMemoryEventLog:
+    """Per-user event sequence numbers, a ring buffer of each user's latest frames and
+    per-device acks.
+
+    Lives in one process, so it only fits the in-process broadcast bus. A user's seq,
+    frames and acks are kept and dropped together: after `ttl` seconds without events
+    or acks, or when more than `max_users` are tracked (least recently active first).
+    Memory is therefore bounded by `max_users * buffer_size` frames. A dropped user's
+    seq restarts, which a resuming client sees as being ahead of the counter.
+    """
+
+    def __init__(self, buffer_size: int, max_users: int, ttl: int):
+        self.buffer_size = buffer_size
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: OrderedDict[int, _UserLog] = OrderedDict()
+
+    def _expire(self, now: float):
+        while self._users:
+            oldest = next(iter(self._users.values()))
+            if len(self._users) <= self.max_users and now - oldest.active_at <= self.ttl:
+                break
+            self._users.popitem(last=False)
+
+    def _touch(self, user_id: int, now: float) -> _UserLog:
+        log = self._users.get(user_id)
+        if log is None:
+            log = self._users[user_id] = _UserLog(self.buffer_size)
+        log.active_at = now
+        self._users.move_to_end(user_id)
+        return log
+
+    def _get(self, user_id: int) -> Optional[_UserLog]:
+        self._expire(time.monotonic())
+        return self._users.get(user_id)
+
+    async def append(self, frames: dict[int, str]) -> dict[int, int]:
+        """Give each user's frame their next seq and buffer it; returns the seqs."""
+        now = time.monotonic()
+        seqs = {}
+        for user_id, frame in frames.items():
+            log = self._touch(user_id, now)
+            log.seq += 1
+            seqs[user_id] = log.seq
+            log.frames.append((log.seq, with_seq(frame, log.seq)))
+        self._expire(now)
+        return seqs
+
+    async def since(self, user_id: int, last_seq: int) -> tuple[int, Optional[list[str]]]:
+        """(current seq, frames after `last_seq`), or frames None if some have rolled out of the buffer."""
+        log = self._get(user_id)
+        current = log.seq if log else 0
+        missed = [frame for seq, frame in (log.frames if log else ()) if seq > last_seq]
+        # a client ahead of the counter saw seqs from before a restart or expiry
+        if last_seq > current or len(missed) < current - last_seq:
+            return current, None
+        return current, missed
+
+    async def ack(self, user_id: int, device_id: str, seq: int):
+        """Record that `device_id` has seen the user's events up to `seq`; acks never move back."""
+        now = time.monotonic()
+        log = self._touch(user_id, now)
+        log.acks[device_id] = max(log.acks.get(device_id, 0), seq)
+        self._expire(now)
+
+    async def acked(self, user_id: int, device_id: str) -> int:
+        log = self._get(user_id)
+        return log.acks.get(device_id, 0) if log else 0
+
+
+class RedisEventLog:
+    """Event log shared by all workers: INCR for seqs, a capped list per user for frames.
+
+    Keys are `ws:seq:<user_id>`, `ws:log:<user_id>` (newest first) and `ws:ack:<user_id>`
+    (device id -> acked seq), and expire after `ttl` seconds without events.
+    """
+
+    def __init__(self, url: str, buffer_size: int, ttl: int, client=None):
+        if client is None:
+            from redis import asyncio as aioredis
+
+            client = aioredis.from_url(url)
+        self._redis = client
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+
+    async def append(self, frames: dict[int, str]) -> dict[int, int]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id in frames:
+                pipe.incr(f"ws:seq:{user_id}")
+                pipe.expire(f"ws:seq:{user_id}", self.ttl)
+            seqs = dict(zip(frames, (await pipe.execute())[::2]))
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, frame in frames.items():
+                key = f"ws:log:{user_id}"
+                pipe.lpush(key, f"{seqs[user_id]}:{with_seq(frame, seqs[user_id])}")
+                pipe.ltrim(key, 0, self.buffer_size - 1)
+                pipe.expire(key, self.ttl)
+            await pipe.execute()
+        return seqs
+
+    async def since(self, user_id: int, last_seq: int) -> tuple[int, Optional[list[str]]]:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.get(f"ws:seq:{user_id}")
+            pipe.lrange(f"ws:log:{user_id}", 0, -1)
+            current, entries = await pipe.execute()
+        current = int(current or 0)
+        missed = []
+        for entry in reversed(entries):
+            seq, frame = entry.decode().split(":", 1)
+            if int(seq) > last_seq:
+                missed.append(frame)
+        # a client ahead of the counter saw seqs from before a restart or expiry
+        if last_seq > current or len(missed) < current - last_seq:
+            return current, None
+        return current, missed
+
+    async def ack(self, user_id: int, device_id: str, seq: int):
+        # a sorted set of device -> seq; ZADD GT only ever raises a device's seq
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(f"ws:ack:{user_id}", {device_id: seq}, gt=True)
+            pipe.expire(f"ws:ack:{user_id}", self.ttl)
+            await pipe.execute()
+
+    async def acked(self, user_id: int, device_id: str) -> int:
+        return int(await self._redis.zscore(f"ws:ack:{user_id}", device_id) or 0)
+
+
+def make_event_log():
+    """Event log matching `settings.broadcast_backend`, so seqs are shared wherever events are."""
+    if settings.broadcast_backend == "redis":
+        return RedisEventLog(settings.redis_url, settings.ws_event_buffer_size, settings.ws_event_log_ttl)
+    return InMemoryEventLog(settings.ws_event_buffer_size, settings.ws_event_log_users, settings.ws_event_log_ttl)
@@ -0,0 +1,21 @@
+from sqlalchemy.future import select
+
+from ..models import Friend
+
+
+def friend_pair(user_id: int, friend_id: int):
+    """The user's link to `friend_id`, a lookup on uq_friends_user_id_friend_id."""
+    return select(Friend).where(Friend.user_id == user_id, Friend.friend_id == friend_id)
+
+
+def accepted_friends(user_id: int):
+    return select(Friend).where(Friend.user_id == user_id, Friend.status == "accepted")
+
+
+def sent_requests(user_id: int):
+    return select(Friend).where(Friend.user_id == user_id, Friend.status == "pending")
+
+
+def subscribers(user_id: int):
+    """Pending requests sent to the user, read on (friend_id, status)."""
+    return select(Friend).where(Friend.friend_id == user_id, Friend.status == "pending")
@@ -0,0 +1,21 @@
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from ..models import ImageUser
+
+
+def _visible(query, user_id: int, include_private: bool):
+    query = query.where(ImageUser.user_id == user_id)
+    if not include_private:
+        query = query.where(ImageUser.private == False)
+    return query
+
+
+def gallery_version(user_id: int, include_private: bool):
+    """Count and newest id of the visible images; gallery rows are append-only, so they identify its contents."""
+    return _visible(select(func.count(), func.max(ImageUser.id)), user_id, include_private)
+
+
+def gallery_images(user_id: int, include_private: bool):
+    return _visible(select(ImageUser), user_id, include_private).options(selectinload(ImageUser.image))
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Chat, ChatMember
+from ..schemas import ChatSend
+from .read_models import chat_member_rows, row_to_chat
+
+
+def inbox_query(user_id: int, chat_id: Optional[int] = None):
+    """The user's chats with their summary columns, most recently active first."""
+    query = (
+        select(
+            Chat.id,
+            Chat.name,
+            Chat.is_group,
+            Chat.avatar_url,
+            Chat.last_message_preview.label("last_content"),
+            Chat.last_message_at.label("last_at"),
+            ChatMember.unread_count,
+        )
+        .select_from(ChatMember)
+        .join(Chat, Chat.id == ChatMember.chat_id)
+        .where(ChatMember.user_id == user_id)
+        .order_by(ChatMember.last_activity_at.desc().nulls_last(), ChatMember.chat_id.desc())
+    )
+    if chat_id is not None:
+        query = query.where(ChatMember.chat_id == chat_id)
+    return query
+
+
+def inbox_members_query(chat_ids: list[int]):
+    return chat_member_rows().where(ChatMember.chat_id.in_(chat_ids))
+
+
+async def load_chats(db: AsyncSession, user_id: int, chat_id: Optional[int] = None) -> list[ChatSend]:
+    """The user's chats (or the one `chat_id`, if they are a member) in two queries total.
+
+    Preview, time and unread count come from the summary columns maintained by
+    `record_message`, and the inbox order is an index scan on
+    (user_id, last_activity_at, chat_id). Members of every chat are fetched in one
+    batched lookup, so the cost does not grow with the chat count.
+    """
+    chats = (await db.execute(inbox_query(user_id, chat_id))).all()
+    if not chats:
+        return []
+
+    members = defaultdict(list)
+    result = await db.execute(inbox_members_query([c.id for c in chats]))
+    for m in result.all():
+        members[m.chat_id].append(m)
+
+    return [row_to_chat(c, members[c.id], user_id) for c in chats]
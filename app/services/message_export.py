@@ -0,0 +1,47 @@
+import asyncio
+import json
+import zlib
+from typing import AsyncIterator
+
+from ..config import settings
+from ..db import AsyncSessionLocal
+from ..models import Message
+from .read_models import message_rows
+from .user_profiles import user_profiles
+
+
+async def export_messages(chat_id: int, compress: bool = False) -> AsyncIterator[bytes]:
+    """Stream a chat's full history as NDJSON, oldest first, optionally gzipped.
+
+    Rows come from a server-side cursor `message_export_batch_size` at a time in a session
+    of its own, so memory stays flat and the export outlives the request's session.
+    Compression runs in a thread so large exports do not stall the event loop.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31: gzip container
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            message_rows()
+            .where(Message.chat_id == chat_id)
+            .order_by(Message.id)
+            .execution_options(yield_per=settings.message_export_batch_size)
+        )
+        async for rows in result.partitions():
+            senders = await user_profiles(db, [row.sender_id for row in rows])
+            chunk = "".join(
+                json.dumps({
+                    "id": row.id,
+                    "chatId": row.chat_id,
+                    "senderId": row.sender_id,
+                    "sender": senders[row.sender_id].username if row.sender_id in senders else None,
+                    "content": row.content,
+                    "imageUrl": row.attachment_url,
+                    "createdAt": row.created_at.isoformat(),
+                }, ensure_ascii=False) + "\n"
+                for row in rows
+            ).encode()
+            if compressor:
+                chunk = await asyncio.to_thread(compressor.compress, chunk)
+            if chunk:
+                yield chunk
+    if compressor:
+        yield compressor.flush()
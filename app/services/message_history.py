@@ -0,0 +1,79 @@
+from typing import Optional
+
+from sqlalchemy import true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import ChatMember, Message
+from ..schemas import MessagePage
+from .read_models import message_rows, row_to_message
+from .user_profiles import user_profiles
+
+
+def message_page_query(chat_id: int, before: Optional[int], after: Optional[int], limit: int):
+    """Up to `limit` messages of the chat next to the cursor, walking away from it on (chat_id, id)."""
+    query = message_rows().where(Message.chat_id == chat_id)
+    if before is not None:
+        query = query.where(Message.id < before)
+    if after is not None:
+        query = query.where(Message.id > after)
+    # walk away from the cursor: forward from `after`, otherwise back from the newest
+    return query.order_by(Message.id.asc() if after is not None else Message.id.desc()).limit(limit)
+
+
+async def message_page(
+    db: AsyncSession,
+    chat_id: int,
+    user_id: int,
+    before: Optional[int],
+    after: Optional[int],
+    limit: int,
+) -> MessagePage:
+    """One page of a chat's history, oldest first, walked on the (chat_id, id) index.
+
+    Without cursors this is the newest `limit` messages. `before` pages back to older
+    messages and `after` forward to newer ones; `hasMore` tells whether another page
+    exists in that direction. Senders come from the profile cache, with one lookup
+    for any the cache is missing.
+    """
+    rows = (await db.execute(message_page_query(chat_id, before, after, limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+
+    senders = await user_profiles(db, [row.sender_id for row in rows])
+    return MessagePage(
+        messages=[row_to_message(row, senders[row.sender_id], user_id) for row in rows],
+        hasMore=has_more,
+    )
+
+
+def messages_since_query(user_id: int, after_id: int, limit: int):
+    """Up to `limit` messages newer than `after_id` across the user's chats, oldest first.
+
+    Driven from the user's chat_members rows: each chat is walked on (chat_id, id) from
+    `after_id` for at most `limit` messages and the per-chat runs are merged by id, so the
+    cost follows the user's chats rather than all traffic since `after_id`.
+    """
+    chats = select(ChatMember.chat_id).where(ChatMember.user_id == user_id).subquery()
+    per_chat = (
+        message_rows()
+        .where(Message.chat_id == chats.c.chat_id, Message.id > after_id)
+        .order_by(Message.id)
+        .limit(limit)
+        .lateral()
+    )
+    return select(per_chat).select_from(chats).join(per_chat, true()).order_by(per_chat.c.id).limit(limit)
+
+
+async def messages_since(db: AsyncSession, user_id: int, after_id: int, limit: int) -> tuple[list, dict, bool]:
+    """Messages newer than `after_id` across the user's chats, oldest first, for catching up.
+
+    Returns (rows, sender profiles, whether more than `limit` exist).
+    """
+    result = await db.execute(messages_since_query(user_id, after_id, limit + 1))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, await user_profiles(db, [row.sender_id for row in rows]), has_more
@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Iterable
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..config import settings
+from ..models import Chat, Message
+from ..schemas import MessageImport
+from .chat_summary import refresh_chat_summary
+
+COPY_COLUMNS = ["chat_id", "sender_id", "content", "attachment_url", "created_at", "is_read"]
+
+_message_list = TypeAdapter(list[MessageImport])
+
+
+def parse_message_array(body: bytes) -> list[MessageImport]:
+    try:
+        return _message_list.validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+
+async def parse_ndjson_messages(chunks: AsyncIterator[bytes]) -> AsyncIterator[MessageImport]:
+    """Messages from a newline-delimited JSON body, parsed as the chunks arrive."""
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield _parse_line(line, line_no)
+    if buffer.strip():
+        yield _parse_line(buffer, line_no + 1)
+
+
+def _parse_line(line: bytes, line_no: int) -> MessageImport:
+    try:
+        return MessageImport.model_validate_json(line)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail={"line": line_no, "errors": e.errors(include_url=False)})
+
+
+async def _iterate(messages: Iterable[MessageImport] | AsyncIterable[MessageImport]) -> AsyncIterator[MessageImport]:
+    if isinstance(messages, AsyncIterable):
+        async for message in messages:
+            yield message
+    else:
+        for message in messages:
+            yield message
+
+
+async def import_messages(
+    db: AsyncSession,
+    chat_id: int,
+    member_ids: frozenset[int],
+    messages: Iterable[MessageImport] | AsyncIterable[MessageImport],
+) -> int:
+    """COPY messages into the chat in batches and refresh the chat summary once at the end.
+
+    Nothing is broadcast. Senders must be members of the chat. Runs in the session's
+    transaction; the caller commits, so a failed import leaves no rows behind.
+
+    History is paged by message id, so imported messages must be in createdAt order,
+    not older than the chat's newest message and not in the future. The chat row stays
+    locked until commit, and `send_message` takes the same lock before inserting, so no
+    live message can get an id among the imported ones.
+    """
+    newest = await db.execute(select(Chat.last_message_at).where(Chat.id == chat_id).with_for_update())
+    newest = newest.first()
+    if newest is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    previous = newest.last_message_at
+    now = datetime.utcnow()
+
+    conn = await db.connection()
+    raw = (await conn.get_raw_connection()).driver_connection
+
+    async def copy(records):
+        await raw.copy_records_to_table(Message.__tablename__, records=records, columns=COPY_COLUMNS)
+
+    total = 0
+    batch = []
+    async for m in _iterate(messages):
+        if m.senderId not in member_ids:
+            raise HTTPException(status_code=400, detail=f"User {m.senderId} is not a member of this chat")
+        created_at = m.createdAt
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if created_at > now:
+            raise HTTPException(status_code=400, detail=f"createdAt {m.createdAt.isoformat()} is in the future")
+        if previous is not None and created_at < previous:
+            raise HTTPException(
+                status_code=400,
+                detail=f"createdAt {m.createdAt.isoformat()} is older than a message already in the chat or out of order",
+            )
+        previous = created_at
+        batch.append((chat_id, m.senderId, m.content, m.imageUrl, created_at, False))
+        if len(batch) >= settings.message_import_batch_size:
+            await copy(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        await copy(batch)
+        total += len(batch)
+
+    if total:
+        await refresh_chat_summary(db, chat_id)
+    return total
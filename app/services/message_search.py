@@ -0,0 +1,99 @@
+import html
+from typing import Optional
+
+from sqlalchemy import and_, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import MESSAGE_SEARCH_CONFIG, ChatMember, Message
+from ..schemas import MessageSearchHit, MessageSearchPage
+from .user_profiles import user_profiles
+
+# ts_headline copies the content verbatim, so matches are delimited with control characters
+# (stripped from the content first) and the snippet is HTML-escaped before they become <mark>
+START_SEL, STOP_SEL = "\x02", "\x03"
+HEADLINE_OPTIONS = f'StartSel="{START_SEL}", StopSel="{STOP_SEL}", MaxWords=20, MinWords=5, MaxFragments=2'
+# the config Message.search_vector is computed with, so query terms normalize to the stored lexemes
+SEARCH_CONFIG = literal_column(f"'{MESSAGE_SEARCH_CONFIG}'::regconfig")
+
+
+def search_query(user_id: int, q: str, chat_id: Optional[int] = None):
+    """Ids and ranks of messages matching `q` in chats the user is a member of, best first.
+
+    Matches come from the GIN index on Message.search_vector; membership is a join on
+    the chat_members primary key.
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(Message.search_vector, tsquery)
+    query = (
+        select(Message.id, rank.label("rank"))
+        .join(ChatMember, and_(ChatMember.chat_id == Message.chat_id, ChatMember.user_id == user_id))
+        .where(Message.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Message.id.desc())
+    )
+    if chat_id is not None:
+        query = query.where(Message.chat_id == chat_id)
+    return query
+
+
+def search_page_query(user_id: int, q: str, chat_id: Optional[int], offset: int, limit: int):
+    """One page of `search_query` with the message columns and a ts_headline snippet per row.
+
+    Snippets are only built for the rows on the page, since ts_headline re-parses the content.
+    """
+    page = search_query(user_id, q, chat_id).offset(offset).limit(limit).subquery()
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    return (
+        select(
+            Message.id,
+            Message.chat_id,
+            Message.sender_id,
+            Message.content,
+            Message.attachment_url,
+            Message.created_at,
+            func.ts_headline(
+                SEARCH_CONFIG, func.translate(Message.content, START_SEL + STOP_SEL, ""), tsquery, HEADLINE_OPTIONS
+            ).label("snippet"),
+        )
+        .join(page, page.c.id == Message.id)
+        .order_by(page.c.rank.desc(), Message.id.desc())
+    )
+
+
+def highlight(snippet: str) -> str:
+    """Escape a ts_headline snippet for HTML and turn the match delimiters into <mark> tags."""
+    return html.escape(snippet).replace(START_SEL, "<mark>").replace(STOP_SEL, "</mark>")
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    chat_id: Optional[int],
+    offset: int,
+    limit: int,
+) -> MessageSearchPage:
+    """One page of ranked search results with highlighted snippets."""
+    result = await db.execute(search_page_query(user_id, q, chat_id, offset, limit + 1))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    senders = await user_profiles(db, [row.sender_id for row in rows])
+    return MessageSearchPage(
+        results=[
+            MessageSearchHit.model_construct(
+                id=row.id,
+                chatId=row.chat_id,
+                direction="send" if row.sender_id == user_id else "recieved",
+                name=senders[row.sender_id].username,
+                message=row.content,
+                snippet=highlight(row.snippet),
+                imageUrl=row.attachment_url,
+                time=row.created_at,
+                avatarUrl=senders[row.sender_id].avatar_url,
+            )
+            for row in rows
+        ],
+        nextOffset=offset + limit if has_more else None,
+    )
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+
+from ..config import settings
+from ..schemas import PostRead
+from .cache import make_cache
+
+post_cache = make_cache(
+    "post",
+    settings.post_cache_size,
+    settings.post_cache_ttl,
+    dump=lambda post: post.model_dump_json(),
+    load=PostRead.model_validate_json,
+)
+
+
+def post_cache_key(post_id: int, updated_at: Optional[datetime], comments_per_post: int) -> str:
+    """Cache key of one rendered variant of a post at the version given by `updated_at`.
+
+    Every write that changes a rendered post bumps Post.updated_at, so entries of older
+    versions are never read again and age out through the TTL / LRU instead of being
+    deleted; a render racing with a write can only store under the version it read.
+    """
+    version = updated_at.isoformat() if updated_at else "0"
+    return f"{post_id}:{version}:{comments_per_post}"
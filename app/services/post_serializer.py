@@ -0,0 +1,54 @@
+from typing import Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import Post
+from ..schemas import PostRead
+from .comment_queries import latest_comments
+from .post_cache import post_cache, post_cache_key
+from .read_models import post_rows, row_to_post
+from .viewer_state import liked_post_ids
+
+
+def published_posts_query(post_ids: list[int]):
+    return post_rows().where(Post.id.in_(post_ids)).where(Post.is_published == True)
+
+
+async def _build_posts(db: AsyncSession, post_ids: list[int], comments_per_post: int) -> dict[int, PostRead]:
+    result = await db.execute(published_posts_query(post_ids))
+    rows = result.all()
+    comments = await latest_comments(db, [row.id for row in rows], comments_per_post)
+    return {row.id: row_to_post(row, comments[row.id]) for row in rows}
+
+
+async def render_posts(
+    db: AsyncSession,
+    posts: Sequence,
+    viewer_id: Optional[int],
+    comments_per_post: int = settings.comment_preview_size,
+) -> list[PostRead]:
+    """Render published posts in the order of `posts`, reading through the post cache.
+
+    `posts` are rows carrying `id` and `updated_at`, as selected by the page query,
+    so the cache key matches the version the ETag was computed from. Cached entries
+    are viewer-independent; isLiked is overlaid per request from a single
+    `liked_post_ids` lookup.
+    """
+    post_ids = [post.id for post in posts]
+    keys = {post.id: post_cache_key(post.id, post.updated_at, comments_per_post) for post in posts}
+    cached = await post_cache.get_many(keys.values())
+    rendered = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+
+    missing = [post_id for post_id in post_ids if post_id not in rendered]
+    if missing:
+        built = await _build_posts(db, missing, comments_per_post)
+        await post_cache.set_many({keys[post_id]: post for post_id, post in built.items()})
+        rendered.update(built)
+
+    liked_ids = await liked_post_ids(db, viewer_id, rendered.keys())
+    return [
+        rendered[post_id].model_copy(update={"isLiked": post_id in liked_ids})
+        for post_id in post_ids
+        if post_id in rendered
+    ]
@@ -0,0 +1,36 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Chat, ChatMember
+
+
+def dm_pair(user_id: int, other_id: int) -> tuple[int, int]:
+    """Canonical (low, high) key of the private chat between two users."""
+    return min(user_id, other_id), max(user_id, other_id)
+
+
+async def get_or_create_private_chat(db: AsyncSession, user_id: int, other_id: int) -> tuple[int, bool]:
+    """Return (chat_id, created) for the private chat between two users.
+
+    Resolved through the unique (dm_user_low, dm_user_high) key, so concurrent calls for the
+    same pair agree on one chat: the losing INSERT waits for the winner and then reads its
+    row. The caller commits.
+    """
+    low, high = dm_pair(user_id, other_id)
+    result = await db.execute(
+        insert(Chat)
+        .values(is_group=False, dm_user_low=low, dm_user_high=high)
+        .on_conflict_do_nothing(constraint="uq_chats_dm_pair")
+        .returning(Chat.id)
+    )
+    chat_id = result.scalar()
+    if chat_id is None:
+        result = await db.execute(select(Chat.id).where(Chat.dm_user_low == low, Chat.dm_user_high == high))
+        return result.scalar_one(), False
+
+    await db.execute(insert(ChatMember).values([
+        {"chat_id": chat_id, "user_id": user_id},
+        {"chat_id": chat_id, "user_id": other_id},
+    ]))
+    return chat_id, True
@@ -0,0 +1,124 @@
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Post
+from .chat_membership import member_ids_query
+from .comment_queries import comment_page_query, latest_comments_query
+from .friend_queries import accepted_friends, friend_pair, sent_requests, subscribers
+from .gallery_queries import gallery_images, gallery_version
+from .inbox import inbox_members_query, inbox_query
+from .message_history import message_page_query, messages_since_query
+from .message_search import search_page_query
+from .pagination import keyset_page
+from .post_serializer import published_posts_query
+from .read_models import post_versions, profile_header_rows
+from .timeline import home_queries
+from .user_profiles import profiles_query
+from .viewer_state import liked_query, unlike_query
+
+SAMPLE_ID = 1
+SAMPLE_IDS = [1, 2, 3]
+PAGE = 20
+
+
+def hot_queries():
+    """(route, statement, index names any of which the plan must use) for each hot query path.
+
+    Statements come from the builders the routes execute, with sample arguments.
+    """
+    home_materialized, home_pulled = home_queries(SAMPLE_ID, None, PAGE)
+    return [
+        ("GET /posts/ page",
+         keyset_page(post_versions(), Post.created_at, Post.id, None, PAGE),
+         ["ix_posts_created_at_id"]),
+        ("GET /posts/{post_id} version",
+         post_versions().where(Post.id == SAMPLE_ID).where(Post.is_published == True),
+         ["posts_pkey"]),
+        ("GET /posts/home materialized timeline",
+         home_materialized,
+         ["ix_timeline_entries_user_created"]),
+        ("GET /posts/home celebrity pull",
+         home_pulled,
+         ["ix_posts_author_id_created_at_id"]),
+        ("render_posts post rows",
+         published_posts_query(SAMPLE_IDS),
+         ["posts_pkey"]),
+        ("render_posts latest comments",
+         latest_comments_query(SAMPLE_IDS, 3),
+         ["ix_comments_post_id_created_at_id"]),
+        ("render_posts isLiked lookup",
+         liked_query(SAMPLE_ID, SAMPLE_IDS),
+         ["uq_likes_post_id_author_id"]),
+        ("DELETE /likes/{post_id}",
+         unlike_query(SAMPLE_ID, SAMPLE_ID),
+         ["uq_likes_post_id_author_id"]),
+        ("GET /comments/{post_id} page",
+         comment_page_query(SAMPLE_ID, None, PAGE),
+         ["ix_comments_post_id_created_at_id"]),
+        ("GET /profile/{user_id} header",
+         profile_header_rows(SAMPLE_ID, include_private=False),
+         ["ix_friends_user_id_friend_id_status", "ix_friends_friend_id_status"]),
+        ("GET /profile/{user_id} posts page",
+         keyset_page(post_versions().where(Post.author_id == SAMPLE_ID), Post.created_at, Post.id, None, PAGE),
+         ["ix_posts_author_id_created_at_id"]),
+        ("GET /chats/ inbox",
+         inbox_query(SAMPLE_ID),
+         ["ix_chat_members_user_id_last_activity_at"]),
+        ("GET /chats/ members",
+         inbox_members_query(SAMPLE_IDS),
+         ["chat_members_pkey"]),
+        ("chat membership lookup",
+         member_ids_query(SAMPLE_ID),
+         ["chat_members_pkey"]),
+        ("GET /chats/{chat_id}/messages page",
+         message_page_query(SAMPLE_ID, None, None, PAGE + 1),
+         ["ix_messages_chat_id_id"]),
+        ("sender profiles",
+         profiles_query(SAMPLE_IDS),
+         ["users_pkey", "ix_users_id"]),
+        ("/ws resume catch-up from the database",
+         messages_since_query(SAMPLE_ID, SAMPLE_ID, PAGE + 1),
+         ["ix_messages_chat_id_id"]),
+        ("GET /chats/search page",
+         search_page_query(SAMPLE_ID, "hello", None, 0, PAGE + 1),
+         ["ix_messages_search_vector"]),
+        ("friend pair lookup",
+         friend_pair(SAMPLE_ID, SAMPLE_ID + 1),
+         ["uq_friends_user_id_friend_id", "ix_friends_user_id_friend_id_status"]),
+        ("GET /friend/{user_id} accepted",
+         accepted_friends(SAMPLE_ID),
+         ["ix_friends_user_id_friend_id_status", "uq_friends_user_id_friend_id"]),
+        ("GET /friend/requests/{user_id}",
+         sent_requests(SAMPLE_ID),
+         ["ix_friends_user_id_friend_id_status", "uq_friends_user_id_friend_id"]),
+        ("GET /friend/following/{user_id}",
+         subscribers(SAMPLE_ID),
+         ["ix_friends_friend_id_status"]),
+        ("GET /gallery/{user_id} version",
+         gallery_version(SAMPLE_ID, include_private=False),
+         ["ix_image_users_user_id_private"]),
+        ("GET /gallery/{user_id} images",
+         gallery_images(SAMPLE_ID, include_private=False),
+         ["ix_image_users_user_id_private"]),
+    ]
+
+
+async def explain_hot_queries(db: AsyncSession, force_index: bool = False):
+    """EXPLAIN every hot query and report whether the plan uses one of its expected indexes.
+
+    Plans are taken with the planner's own settings, so run this against production-sized
+    data. `force_index` disables sequential scans for the transaction, which shows the
+    index a query can use on small development tables.
+    """
+    report = []
+    if force_index:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+    for name, stmt, indexes in hot_queries():
+        sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        result = await db.execute(text(f"EXPLAIN {sql}"))
+        plan = "\n".join(row[0] for row in result.all())
+        used = next((index for index in indexes if index in plan), None)
+        report.append((name, used, plan))
+    await db.rollback()
+    return report
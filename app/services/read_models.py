@@ -0,0 +1,168 @@
+"""Column projections for read endpoints and the response models built from them.
+
+Rows come straight from `select(<columns>)`, so no ORM objects are hydrated, and
+the schemas are assembled with `model_construct` because the values are already
+typed by the database driver.
+"""
+import datetime
+
+from sqlalchemy import and_, func, or_, true
+from sqlalchemy.future import select
+
+from ..models import ChatMember, Comment, Friend, ImageUser, Message, Post, User
+from ..schemas import ChatMemberSend, ChatSend, CommentRead, MessageSend, PostRead
+
+
+def post_rows():
+    return (
+        select(
+            Post.id,
+            Post.author_id,
+            Post.content,
+            Post.image_url,
+            Post.created_at,
+            Post.like_count,
+            Post.comment_count,
+            User.username,
+            User.avatar_url,
+        )
+        .join(User, User.id == Post.author_id)
+    )
+
+
+def post_versions():
+    """Page rows for post lists: the keyset columns plus what the post ETag and cache key cover."""
+    return select(Post.id, Post.created_at, Post.updated_at, Post.like_count, Post.comment_count)
+
+
+def row_to_post(row, comments: list[CommentRead], is_liked: bool = False) -> PostRead:
+    return PostRead.model_construct(
+        id=row.id,
+        user=row.username,
+        userId=row.author_id,
+        postTime=row.created_at,
+        text=row.content,
+        image=row.image_url,
+        avatarUrl=row.avatar_url,
+        likes=row.like_count,
+        isLiked=is_liked,
+        comments=comments,
+        commentCount=row.comment_count,
+    )
+
+
+def comment_rows():
+    """Comment columns with the author joined in, so no per-row author load is needed."""
+    return (
+        select(
+            Comment.id,
+            Comment.post_id,
+            Comment.author_id,
+            Comment.content,
+            Comment.created_at,
+            User.username,
+            User.avatar_url,
+        )
+        .join(User, User.id == Comment.author_id)
+    )
+
+
+def row_to_comment(row) -> CommentRead:
+    return CommentRead.model_construct(
+        id=row.id,
+        postId=row.post_id,
+        userId=row.author_id,
+        username=row.username,
+        avatarUrl=row.avatar_url,
+        content=row.content,
+        createdAt=row.created_at,
+    )
+
+
+def message_rows():
+    return select(
+        Message.id,
+        Message.chat_id,
+        Message.sender_id,
+        Message.content,
+        Message.attachment_url,
+        Message.created_at,
+    )
+
+
+def sender_rows():
+    return select(User.id, User.username, User.avatar_url)
+
+
+def row_to_message(row, sender, user_id: int) -> MessageSend:
+    """Build a MessageSend from a `message_rows` row and its sender's `sender_rows` row."""
+    return MessageSend.model_construct(
+        id=row.id,
+        direction="send" if row.sender_id == user_id else "recieved",
+        name=sender.username,
+        message=row.content,
+        imageUrl=row.attachment_url,
+        time=row.created_at,
+        avatarUrl=sender.avatar_url,
+    )
+
+
+def chat_member_rows():
+    return (
+        select(ChatMember.chat_id, User.id, User.username, User.avatar_url)
+        .join(User, User.id == ChatMember.user_id)
+    )
+
+
+def profile_header_rows(user_id: int, include_private: bool):
+    """User row plus friend, subscriber and photo counts in a single round trip."""
+    friend_counts = (
+        select(
+            func.count().filter(and_(Friend.user_id == user_id, Friend.status == "accepted")).label("friend_count"),
+            func.count().filter(and_(Friend.friend_id == user_id, Friend.status == "pending")).label("subscriber_count"),
+        )
+        .where(or_(Friend.user_id == user_id, Friend.friend_id == user_id))
+        .subquery()
+    )
+    photos = select(func.count()).select_from(ImageUser).where(ImageUser.user_id == user_id)
+    if not include_private:
+        photos = photos.where(ImageUser.private == False)
+
+    return (
+        select(
+            User.id,
+            User.username,
+            User.avatar_url,
+            friend_counts.c.friend_count,
+            friend_counts.c.subscriber_count,
+            photos.scalar_subquery().label("photo_count"),
+        )
+        .join(friend_counts, true())
+        .where(User.id == user_id)
+    )
+
+
+def row_to_chat(chat, members: list, user_id: int) -> ChatSend:
+    """Build a ChatSend from a chat row carrying `last_content`/`last_at` of its newest message
+    and the viewer's `unread_count`.
+
+    Private chats are named and badged after the other member.
+    """
+    other = next((m for m in members if m.id != user_id), None)
+    if not chat.is_group and other:
+        name, badge = other.username, other.avatar_url
+    else:
+        name, badge = chat.name, chat.avatar_url
+
+    return ChatSend.model_construct(
+        id=chat.id,
+        name=name if name else "Undefined",
+        preview=chat.last_content or "...",
+        chatTime=chat.last_at if chat.last_at else datetime.datetime.utcnow(),
+        chatBadge=badge,
+        unreadCount=chat.unread_count,
+        chatMembers=[
+            ChatMemberSend.model_construct(id=m.id, username=m.username, avatarUrl=m.avatar_url)
+            for m in members
+        ],
+    )
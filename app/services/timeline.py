@@ -0,0 +1,149 @@
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, literal, or_, true, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..config import settings
+from ..models import Friend, Post, TimelineEntry, User
+from .pagination import keyset_page, split_page
+
+ENTRY_COLUMNS = ["user_id", "post_id", "author_id", "created_at"]
+
+
+def _accepted_friends(user_id: int):
+    return select(Friend.friend_id).where(Friend.user_id == user_id, Friend.status == "accepted")
+
+
+async def fan_out_post(db: AsyncSession, post: Post):
+    """Write a freshly flushed post into the author's timeline and their friends' timelines.
+
+    Authors with more than `timeline_fanout_limit` friends are flagged as celebrities
+    and only get their own entry; readers pull their posts in `home_page` instead.
+    When an author drops back under the limit, the posts written while they were a
+    celebrity would no longer be pulled, so friends' timelines are backfilled first.
+    """
+    friend_count = await db.scalar(
+        select(func.count()).select_from(_accepted_friends(post.author_id).subquery())
+    )
+    is_celebrity = friend_count > settings.timeline_fanout_limit
+    flipped = await db.execute(
+        update(User)
+        .where(User.id == post.author_id, User.is_celebrity != is_celebrity)
+        .values(is_celebrity=is_celebrity)
+        .returning(User.id)
+    )
+    if flipped.first() and not is_celebrity:
+        await _backfill_friends(db, post.author_id)
+
+    await db.execute(
+        insert(TimelineEntry)
+        .values(user_id=post.author_id, post_id=post.id, author_id=post.author_id, created_at=post.created_at)
+        .on_conflict_do_nothing()
+    )
+    if not is_celebrity:
+        readers = select(
+            Friend.friend_id,
+            literal(post.id),
+            literal(post.author_id),
+            literal(post.created_at),
+        ).where(Friend.user_id == post.author_id, Friend.status == "accepted")
+        await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, readers).on_conflict_do_nothing())
+
+
+async def _backfill_friends(db: AsyncSession, author_id: int):
+    """Copy the author's most recent posts into every accepted friend's timeline."""
+    recent = (
+        select(Post.id, Post.author_id, Post.created_at)
+        .where(Post.author_id == author_id)
+        .order_by(Post.created_at.desc())
+        .limit(settings.timeline_backfill_size)
+        .subquery()
+    )
+    rows = (
+        select(Friend.friend_id, recent.c.id, recent.c.author_id, recent.c.created_at)
+        .join(recent, true())
+        .where(Friend.user_id == author_id, Friend.status == "accepted")
+    )
+    await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, rows).on_conflict_do_nothing())
+
+
+async def remove_post(db: AsyncSession, post_id: int):
+    await db.execute(delete(TimelineEntry).where(TimelineEntry.post_id == post_id))
+
+
+async def link_friends(db: AsyncSession, user_id: int, friend_id: int):
+    """Backfill each side's timeline with the other's most recent posts after a friendship is accepted."""
+    for reader, author in ((user_id, friend_id), (friend_id, user_id)):
+        recent = (
+            select(literal(reader), Post.id, Post.author_id, Post.created_at)
+            .join(User, User.id == Post.author_id)
+            .where(Post.author_id == author, User.is_celebrity == False)
+            .order_by(Post.created_at.desc())
+            .limit(settings.timeline_backfill_size)
+        )
+        await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, recent).on_conflict_do_nothing())
+
+
+async def unlink_friends(db: AsyncSession, user_id: int, friend_id: int):
+    await db.execute(
+        delete(TimelineEntry).where(
+            or_(
+                and_(TimelineEntry.user_id == user_id, TimelineEntry.author_id == friend_id),
+                and_(TimelineEntry.user_id == friend_id, TimelineEntry.author_id == user_id),
+            )
+        )
+    )
+
+
+def home_queries(user_id: int, cursor: Optional[str], limit: int):
+    """The two keyset pages `home_page` merges: materialized entries and pulled celebrity posts.
+
+    Materialized entries come from a single range scan on (user_id, created_at, post_id);
+    posts of celebrity friends are pulled on read. Both carry updated_at, the post
+    version `render_posts` keys its cache on.
+    """
+    materialized = (
+        select(TimelineEntry.post_id.label("id"), TimelineEntry.created_at, Post.updated_at)
+        .join(Post, Post.id == TimelineEntry.post_id)
+        .where(TimelineEntry.user_id == user_id)
+    )
+    pulled = (
+        select(Post.id, Post.created_at, Post.updated_at)
+        .join(Friend, and_(Friend.friend_id == Post.author_id, Friend.user_id == user_id))
+        .join(User, User.id == Post.author_id)
+        .where(Friend.status == "accepted", User.is_celebrity == True)
+    )
+    return (
+        keyset_page(materialized, TimelineEntry.created_at, TimelineEntry.post_id, cursor, limit),
+        keyset_page(pulled, Post.created_at, Post.id, cursor, limit),
+    )
+
+
+async def home_page(db: AsyncSession, user_id: int, cursor: Optional[str], limit: int):
+    """One page of (id, created_at, updated_at) rows for the user's home timeline, newest first."""
+    pushed, pulled = home_queries(user_id, cursor, limit)
+    pushed_rows = await db.execute(pushed)
+    pulled_rows = await db.execute(pulled)
+
+    merged = {row.id: row for row in [*pushed_rows.all(), *pulled_rows.all()]}
+    rows = sorted(merged.values(), key=lambda r: (r.created_at, r.id), reverse=True)
+    return split_page(rows, limit)
+
+
+async def backfill_timelines(db: AsyncSession) -> int:
+    """Materialize timelines for posts that predate fan-out (own posts plus non-celebrity friends' posts)."""
+    own = select(Post.author_id, Post.id, Post.author_id, Post.created_at)
+    friends = (
+        select(Friend.user_id, Post.id, Post.author_id, Post.created_at)
+        .join(Post, Post.author_id == Friend.friend_id)
+        .join(User, User.id == Post.author_id)
+        .where(Friend.status == "accepted", User.is_celebrity == False)
+    )
+    inserted = 0
+    for rows in (own, friends):
+        result = await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, rows).on_conflict_do_nothing())
+        inserted += result.rowcount
+    await db.commit()
+    return inserted
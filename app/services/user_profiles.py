@@ -0,0 +1,50 @@
+import json
+from typing import Iterable, NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import User
+from .cache import make_cache
+from .read_models import sender_rows
+
+
+class UserProfile(NamedTuple):
+    """The bits of a user shown next to their messages."""
+
+    id: int
+    username: str
+    avatar_url: str | None
+
+
+profile_cache = make_cache(
+    "profile",
+    settings.profile_cache_size,
+    settings.profile_cache_ttl,
+    dump=lambda profile: json.dumps(profile._asdict()),
+    load=lambda raw: UserProfile(**json.loads(raw)),
+)
+
+
+def profiles_query(user_ids: list[int]):
+    return sender_rows().where(User.id.in_(user_ids))
+
+
+async def user_profiles(db: AsyncSession, user_ids: Iterable[int]) -> dict[int, UserProfile]:
+    """Profiles of the given users, read through the profile cache; misses share one query."""
+    keys = {user_id: str(user_id) for user_id in set(user_ids)}
+    cached = await profile_cache.get_many(keys.values())
+    profiles = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+
+    missing = [user_id for user_id in keys if user_id not in profiles]
+    if missing:
+        result = await db.execute(profiles_query(missing))
+        loaded = {row.id: UserProfile(row.id, row.username, row.avatar_url) for row in result.all()}
+        await profile_cache.set_many({keys[user_id]: profile for user_id, profile in loaded.items()})
+        profiles.update(loaded)
+    return profiles
+
+
+async def invalidate_profiles(user_ids: Iterable[int]):
+    """Drop cached profiles; call after committing a username or avatar change."""
+    await profile_cache.delete_many(str(user_id) for user_id in user_ids)
@@ -0,0 +1,25 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Like
+
+
+def liked_query(user_id: int, post_ids: list[int]):
+    return select(Like.post_id).where(Like.author_id == user_id, Like.post_id.in_(post_ids))
+
+
+def unlike_query(user_id: int, post_id: int):
+    """DELETE of the viewer's like returning its id, so only the request that removed it sees a row."""
+    return delete(Like).where(Like.post_id == post_id, Like.author_id == user_id).returning(Like.id)
+
+
+async def liked_post_ids(db: AsyncSession, user_id: Optional[int], post_ids: Iterable[int]) -> set[int]:
+    """Return the subset of `post_ids` the viewer has liked, in one query per page."""
+    post_ids = list(post_ids)
+    if not user_id or not post_ids:
+        return set()
+    result = await db.execute(liked_query(user_id, post_ids))
+    return set(result.scalars().all())
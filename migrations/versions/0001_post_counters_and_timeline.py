@@ -0,0 +1,57 @@
+"""post counters and home timeline
+
+Brings databases created before migrations existed (tables made by
+Base.metadata.create_all on startup) up to the current schema. Every step is
+idempotent so it is also safe on a database create_all has already updated.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE posts ADD COLUMN IF NOT EXISTS like_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE posts ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_celebrity BOOLEAN NOT NULL DEFAULT false")
+    op.execute(
+        """
+        UPDATE posts SET
+            like_count = (SELECT count(*) FROM likes WHERE likes.post_id = posts.id),
+            comment_count = (SELECT count(*) FROM comments WHERE comments.post_id = posts.id)
+        """
+    )
+
+    op.create_table(
+        "timeline_entries",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_timeline_entries_user_created",
+        "timeline_entries",
+        ["user_id", "created_at", "post_id"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_timeline_entries_user_created", table_name="timeline_entries", if_exists=True)
+    op.drop_table("timeline_entries", if_exists=True)
+    op.drop_column("users", "is_celebrity")
+    op.drop_column("posts", "comment_count")
+    op.drop_column("posts", "like_count")
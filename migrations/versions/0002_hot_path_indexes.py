@@ -0,0 +1,90 @@
+"""indexes and unique constraints for hot query paths
+
+Duplicate likes / friend rows left behind by the old check-then-insert guards
+are removed (keeping the oldest row) before the unique constraints are added.
+
+Indexes are built with CREATE INDEX CONCURRENTLY outside the migration
+transaction, so the tables keep taking writes while they build; the unique
+constraints are then attached to their concurrently built indexes. A build
+that failed half-way leaves an INVALID index behind, which is dropped and
+rebuilt on the next run.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_posts_created_at_id", "posts", ["created_at", "id"]),
+    ("ix_posts_author_id_created_at_id", "posts", ["author_id", "created_at", "id"]),
+    ("ix_comments_post_id_created_at_id", "comments", ["post_id", "created_at", "id"]),
+    ("ix_messages_chat_id_created_at", "messages", ["chat_id", "created_at"]),
+    ("ix_chat_members_user_id", "chat_members", ["user_id"]),
+    ("ix_friends_user_id_friend_id_status", "friends", ["user_id", "friend_id", "status"]),
+    ("ix_friends_friend_id_status", "friends", ["friend_id", "status"]),
+    ("ix_image_users_user_id_private", "image_users", ["user_id", "private"]),
+]
+
+UNIQUE_CONSTRAINTS = [
+    ("uq_likes_post_id_author_id", "likes", ["post_id", "author_id"]),
+    ("uq_friends_user_id_friend_id", "friends", ["user_id", "friend_id"]),
+]
+
+
+def _constraint_exists(name: str) -> bool:
+    return op.get_bind().scalar(sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}) is not None
+
+
+def _drop_invalid_index(name: str):
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"), {"name": name}
+    )
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            _drop_invalid_index(name)
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+    op.execute(
+        """
+        DELETE FROM likes a USING likes b
+        WHERE a.post_id = b.post_id AND a.author_id = b.author_id AND a.id > b.id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM friends a USING friends b
+        WHERE a.user_id = b.user_id AND a.friend_id = b.friend_id AND a.id > b.id
+        """
+    )
+    op.execute("UPDATE posts SET like_count = (SELECT count(*) FROM likes WHERE likes.post_id = posts.id)")
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in UNIQUE_CONSTRAINTS:
+            if not _constraint_exists(name):
+                _drop_invalid_index(name)
+                op.create_index(name, table, columns, unique=True, if_not_exists=True, postgresql_concurrently=True)
+                op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+
+def downgrade() -> None:
+    for name, table, _ in UNIQUE_CONSTRAINTS:
+        op.drop_constraint(name, table, type_="unique")
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,90 @@
+"""chat summary and per-member unread counters
+
+Existing history is treated as read: last_read_message_id is set to the chat's
+newest message and unread_count starts at 0. The inbox index is built
+concurrently, outside the migration transaction.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_invalid_index(name: str):
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"), {"name": name}
+    )
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_id INTEGER")
+    op.execute("ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITHOUT TIME ZONE")
+    op.execute("ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR(255)")
+    op.execute("ALTER TABLE chat_members ADD COLUMN IF NOT EXISTS last_read_message_id INTEGER")
+    op.execute("ALTER TABLE chat_members ADD COLUMN IF NOT EXISTS unread_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE chat_members ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP WITHOUT TIME ZONE")
+
+    op.execute(
+        """
+        UPDATE chats SET
+            last_message_id = last.id,
+            last_message_at = last.created_at,
+            last_message_preview = left(coalesce(last.content, ''), 255)
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id, created_at, content
+            FROM messages
+            ORDER BY chat_id, created_at DESC, id DESC
+        ) AS last
+        WHERE last.chat_id = chats.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE chat_members SET
+            last_read_message_id = chats.last_message_id,
+            unread_count = 0,
+            last_activity_at = coalesce(chats.last_message_at, chat_members.joined_at)
+        FROM chats
+        WHERE chats.id = chat_members.chat_id
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_chat_members_user_id_last_activity_at")
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_members_user_id_last_activity_at
+            ON chat_members (user_id, last_activity_at DESC NULLS LAST, chat_id DESC)
+            """
+        )
+        op.drop_index("ix_chat_members_user_id", table_name="chat_members", if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_chat_members_user_id", "chat_members", ["user_id"], if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index(
+            "ix_chat_members_user_id_last_activity_at",
+            table_name="chat_members",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_column("chat_members", "last_activity_at")
+    op.drop_column("chat_members", "unread_count")
+    op.drop_column("chat_members", "last_read_message_id")
+    op.drop_column("chats", "last_message_preview")
+    op.drop_column("chats", "last_message_at")
+    op.drop_column("chats", "last_message_id")
@@ -0,0 +1,50 @@
+"""index chat history pages on (chat_id, id)
+
+Message history is paged by message id, so the (chat_id, id) index replaces
+(chat_id, created_at), which nothing reads since the inbox moved to the chat
+summary columns. Both are built / dropped concurrently, outside the migration
+transaction, so sends keep flowing while the index builds.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_invalid_index(name: str):
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"), {"name": name}
+    )
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_messages_chat_id_id")
+        op.create_index("ix_messages_chat_id_id", "messages", ["chat_id", "id"], if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_messages_chat_id_created_at", table_name="messages", if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_messages_chat_id_created_at")
+        op.create_index(
+            "ix_messages_chat_id_created_at",
+            "messages",
+            ["chat_id", "created_at"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_messages_chat_id_id", table_name="messages", if_exists=True, postgresql_concurrently=True)
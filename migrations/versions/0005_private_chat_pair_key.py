@@ -0,0 +1,58 @@
+"""canonical user-pair key for private chats
+
+Existing two-member private chats get their (low, high) user pair. If a pair
+already has several private chats, only the oldest one is keyed; the others
+stay reachable by id but are no longer returned for the pair.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _constraint_exists(name: str) -> bool:
+    return op.get_bind().scalar(sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}) is not None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE chats ADD COLUMN IF NOT EXISTS dm_user_low INTEGER REFERENCES users (id)")
+    op.execute("ALTER TABLE chats ADD COLUMN IF NOT EXISTS dm_user_high INTEGER REFERENCES users (id)")
+
+    op.execute(
+        """
+        UPDATE chats SET dm_user_low = pair.low, dm_user_high = pair.high
+        FROM (
+            SELECT DISTINCT ON (low, high) chat_id, low, high
+            FROM (
+                SELECT cm.chat_id, min(cm.user_id) AS low, max(cm.user_id) AS high
+                FROM chat_members cm
+                JOIN chats c ON c.id = cm.chat_id
+                WHERE NOT coalesce(c.is_group, false)
+                GROUP BY cm.chat_id
+                HAVING count(*) = 2
+            ) AS dms
+            ORDER BY low, high, chat_id
+        ) AS pair
+        WHERE chats.id = pair.chat_id AND chats.dm_user_low IS NULL
+        """
+    )
+
+    if not _constraint_exists("uq_chats_dm_pair"):
+        op.create_unique_constraint("uq_chats_dm_pair", "chats", ["dm_user_low", "dm_user_high"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_chats_dm_pair", "chats", type_="unique")
+    op.drop_column("chats", "dm_user_high")
+    op.drop_column("chats", "dm_user_low")
@@ -0,0 +1,48 @@
+"""full-text search over message content
+
+Adds a stored generated tsvector column and a GIN index on it. Adding the
+column rewrites the messages table, so run this in a quiet period on large
+databases; the GIN index is then built concurrently, outside the migration
+transaction.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_invalid_index(name: str):
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"), {"name": name}
+    )
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED
+        """
+    )
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_messages_search_vector")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_search_vector ON messages USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_messages_search_vector", table_name="messages", if_exists=True, postgresql_concurrently=True)
+    op.drop_column("messages", "search_vector")
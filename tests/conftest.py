@@ -0,0 +1,7 @@
+import os
+
+# app.config reads these at import time; the tests below never connect to them
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://postgres@localhost/react")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("S3_ACCESS_KEY", "test")
+os.environ.setdefault("S3_SECRET_KEY", "test")
@@ -0,0 +1,59 @@
+import asyncio
+
+import fakeredis
+from fakeredis import aioredis as fake_aioredis
+
+from app.services.broadcast_bus import RedisBus, chat_channel
+
+
+def collector():
+    received = asyncio.Queue()
+
+    async def handler(channel, data):
+        await received.put((channel, data))
+
+    return received, handler
+
+
+def test_publish_reaches_other_worker():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        publisher = RedisBus("", client=fake_aioredis.FakeRedis(server=server))
+        subscriber = RedisBus("", client=fake_aioredis.FakeRedis(server=server))
+        _, publisher_handler = collector()
+        received, subscriber_handler = collector()
+        await publisher.start(publisher_handler)
+        await subscriber.start(subscriber_handler)
+        try:
+            await publisher.publish(chat_channel(1), b'{"type":"message"}')
+            return await asyncio.wait_for(received.get(), timeout=2)
+        finally:
+            await publisher.stop()
+            await subscriber.stop()
+
+    assert asyncio.run(scenario()) == ("ws:chat:1", b'{"type":"message"}')
+
+
+def test_resubscribes_after_disconnect():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        publisher = RedisBus("", client=fake_aioredis.FakeRedis(server=server))
+        subscriber = RedisBus("", client=fake_aioredis.FakeRedis(server=server))
+        subscriber.reconnect_delay = 0.01
+        received, handler = collector()
+        await subscriber.start(handler)
+        try:
+            server.connected = False
+            await asyncio.sleep(0.05)
+            server.connected = True
+            # keep publishing until the listener has re-subscribed
+            for _ in range(100):
+                await publisher.publish(chat_channel(2), b"after")
+                try:
+                    return await asyncio.wait_for(received.get(), timeout=0.05)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await subscriber.stop()
+
+    assert asyncio.run(scenario()) == ("ws:chat:2", b"after")